@@ -0,0 +1,231 @@
+"""Benchmark the scheduling pipeline stage by stage.
+
+Each stage is timed and memory-profiled separately: json load, process_frame for
+each variant, enqueue, the run loop, save_history, get_statistics and
+visualization. Stages run on the bundled dataset and on the dataset scaled up by
+repeating its frames. Results are written as json, and can be compared with a
+previous result to catch slowdowns. Any directory holding frames and the two
+json files can be benchmarked, such as one written by generate_dataset.py.
+
+Run from the MP2 directory, e.g.
+
+    python benchmark.py --scales 1 10 --output bench.json
+    python benchmark.py --scales 1 10 --compare bench.json
+"""
+import argparse
+import importlib
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from scheduling.Scheduler import *
+
+
+DETECTION_FILE = 'depth_clustering_detection_flat.json'
+GROUND_TRUTH_FILE = 'waymo_ground_truth_flat.json'
+VARIANTS = ["process_frame_og", "process_frame_p1", "process_frame_p2",
+            "process_frame_p3", "process_frame_p4"]
+
+
+def measure(function, repeat):
+    """Time function() repeat times and trace the memory of one extra call.
+
+    Returns:
+        A dictionary with the median and minimum time in seconds and the peak
+        memory allocated during the call in bytes.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": statistics.median(times), "min_seconds": min(times),
+            "repeat": repeat, "peak_memory_bytes": peak}
+
+
+def scaled_names(names, scale):
+    """Return the frame names of the dataset repeated scale times.
+
+    The first copy keeps the original names, later copies continue the
+    frame_camera_<number>.png numbering.
+    """
+    if scale == 1:
+        return list(names)
+    return ["frame_camera_{:d}.png".format(i) for i in range(scale * len(names))]
+
+
+def scale_boxes(boxes, names, scale):
+    """Repeat the frames of a box dictionary scale times under new frame names."""
+    scaled = {}
+    for i, new_name in enumerate(scaled_names(names, scale)):
+        name = names[i % len(names)]
+        if name in boxes:
+            scaled[new_name] = [entry[:] for entry in boxes[name]]
+    return scaled
+
+
+class Workload:
+    """The frames, cluster boxes and ground truth of one benchmark input."""
+    def __init__(self, image_directory, scale):
+        self.name = "dataset" if scale == 1 else "dataset x{:d}".format(scale)
+        self.detection_file = os.path.join(image_directory, DETECTION_FILE)
+        self.ground_truth_file = os.path.join(image_directory, GROUND_TRUTH_FILE)
+        names = [os.path.basename(path) for path in extract_png_files(image_directory)]
+        self.box_info = scale_boxes(read_json_file(self.detection_file), names, scale)
+        self.ground_truth = scale_boxes(read_json_file(self.ground_truth_file), names, scale)
+        # frames without cluster boxes are skipped, process_frame would exit on them
+        self.image_list = [os.path.join(image_directory, name)
+                           for name in scaled_names(names, scale) if name in self.box_info]
+
+    def task_sets(self, module):
+        """Return the task_set of every frame for a process_frame module."""
+        return [module.process_frame(Image(path)) for path in self.image_list]
+
+    def scheduler(self, module, **kwargs):
+        """Return a Scheduler replaying this workload with a process_frame module."""
+        task_sets = dict(zip(self.image_list, self.task_sets(module)))
+        return Scheduler(image_list = self.image_list, event_driven = True,
+                         process_frame = lambda frame: task_sets[frame.path], **kwargs)
+
+
+def load_variant(name, workload):
+    """Import a process_frame module and point it at the workload's boxes."""
+    module = importlib.import_module(name)
+    module.box_info = workload.box_info
+    return module
+
+
+def bench_workload(workload, variants, repeat, vis_frames):
+    """Benchmark every stage on one workload and return the result rows."""
+    rows = []
+
+    def add(stage, function, repeat = repeat):
+        row = {"stage": stage, "input": workload.name, "frames": len(workload.image_list)}
+        row.update(measure(function, repeat))
+        rows.append(row)
+        print("{:<36s}{:<16s}{:>10.4f} s{:>12.1f} MB".format(
+            stage, workload.name, row["seconds"], row["peak_memory_bytes"] / 1e6), file=sys.stderr)
+
+    if workload.name == "dataset":
+        add("json_load", lambda: (read_json_file(workload.detection_file),
+                               read_json_file(workload.ground_truth_file)))
+
+    for variant in variants:
+        module = load_variant(variant, workload)
+        add("process_frame/" + variant, lambda: workload.task_sets(module))
+
+    module = load_variant("process_frame_p4", workload)
+    task_sets = workload.task_sets(module)
+
+    def enqueue():
+        scheduler = Scheduler(image_list = workload.image_list)
+        for task_set in task_sets:
+            scheduler.enqueue_task(task_set)
+    add("enqueue", enqueue)
+
+    # the run loops replay precomputed task sets, so process_frame is not timed
+    for loop in ["run_tick", "run_event_driven"]:
+        schedulers = [workload.scheduler(module) for _ in range(repeat + 1)]
+        add("run/" + loop, lambda: getattr(schedulers.pop(), loop)())
+
+    scheduler = workload.scheduler(module)
+    scheduler.run(save = False)
+    with tempfile.TemporaryDirectory() as output_directory:
+        cwd = os.getcwd()
+        os.chdir(output_directory)
+        try:
+            add("save_history", scheduler.save_history)
+        finally:
+            os.chdir(cwd)
+
+    def statistics_stage():
+        boxes = {name: [box[:] for box in scheduler.scheduled_boxes[name]]
+                 for name in scheduler.scheduled_boxes}
+        compute_statistics(workload.ground_truth, boxes)
+    add("get_statistics", statistics_stage)
+
+    if workload.name == "dataset" and vis_frames > 0:
+        with tempfile.TemporaryDirectory() as image_directory:
+            history = {}
+            for i, task in enumerate(scheduler.history):
+                if task.image_path in workload.image_list[:vis_frames]:
+                    entry = dict(task.__dict__)
+                    entry["image_path"] = os.path.join(image_directory, os.path.basename(task.image_path))
+                    entry["image_out_path"] = os.path.join(image_directory, "out",
+                                                           os.path.basename(task.image_path))
+                    history[i + 1] = entry
+            for path in workload.image_list[:vis_frames]:
+                shutil.copy(path, image_directory)
+
+            def visualize():
+                shutil.rmtree(os.path.join(image_directory, "out"), ignore_errors=True)
+                visualize_history_file(history, processes = 1)
+            add("visualize/{:d}_frames".format(vis_frames), visualize, repeat = 1)
+
+    return rows
+
+
+def compare(rows, baseline_rows, tolerance):
+    """Print stages slower than the baseline by more than tolerance.
+
+    Returns:
+        The number of regressions.
+    """
+    baseline = {(row["stage"], row["input"]): row for row in baseline_rows}
+    regressions = 0
+    for row in rows:
+        base = baseline.get((row["stage"], row["input"]))
+        if base is None or base["seconds"] == 0:
+            continue
+        ratio = row["seconds"] / base["seconds"]
+        if ratio > 1 + tolerance:
+            regressions += 1
+            print("slower: {:s} on {:s}: {:.4f} s -> {:.4f} s ({:.2f}x)".format(
+                row["stage"], row["input"], base["seconds"], row["seconds"], ratio))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--image-directory", default="../dataset/")
+    parser.add_argument("--scales", nargs="+", type=int, default=[1, 10],
+                        help="repeat the dataset frames this many times")
+    parser.add_argument("--variants", nargs="+", default=VARIANTS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--vis-frames", type=int, default=5,
+                        help="number of frames rendered by the visualization stage")
+    parser.add_argument("--output", default=None, help="save the results as json")
+    parser.add_argument("--compare", default=None, help="json results to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="relative slowdown reported as a regression")
+    args = parser.parse_args()
+
+    rows = []
+    for scale in args.scales:
+        rows.extend(bench_workload(Workload(args.image_directory, scale), args.variants,
+                                   args.repeat, args.vis_frames))
+
+    result = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "results": rows,
+    }
+    if args.output:
+        with open(args.output, 'w') as outfile:
+            json.dump(result, outfile, ensure_ascii=False, indent=4)
+    else:
+        print(json.dumps(result, ensure_ascii=False, indent=4))
+
+    if args.compare:
+        if compare(rows, read_json_file(args.compare)["results"], args.tolerance):
+            sys.exit(1)
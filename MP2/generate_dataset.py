@@ -0,0 +1,157 @@
+"""Generate a synthetic dataset in the format of the bundled dataset.
+
+Writes depth_clustering_detection_flat.json, waymo_ground_truth_flat.json and,
+optionally, placeholder frames to an output directory. Every frame has ground
+truth objects, and cluster boxes are placed around them: several overlapping
+clusters per object for a tunable fraction of the clusters, plus clutter
+clusters that do not belong to any object. The same seed always produces the
+same dataset.
+
+Run from the MP2 directory, e.g.
+
+    python generate_dataset.py ../synthetic/ --frames 100000 --boxes-per-frame 500
+"""
+import argparse
+import json
+import os
+import numpy as np
+import cv2
+
+
+FRAME_WIDTH = 1920
+FRAME_HEIGHT = 1280
+ID_CHARACTERS = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"))
+
+
+class SyntheticDataset:
+    """Parameters of a synthetic dataset and the generator of its frames.
+
+    Attributes:
+        num_frames: number of frames.
+        boxes_per_frame: mean number of cluster boxes per frame.
+        objects_per_frame: mean number of ground truth objects per frame.
+        box_size: (mean, standard deviation) of the log of the box width in pixels.
+        aspect: (low, high) range of the box height / width ratio.
+        depth: (low, high) range of the object depth in meters. Depths are drawn
+                uniformly in that range.
+        overlap_fraction: fraction of cluster boxes placed around an object, so that
+                they overlap other clusters of the same object.
+        seed: seed of the random generator.
+    """
+    def __init__(self, num_frames = 200, boxes_per_frame = 19, objects_per_frame = 2,
+                 box_size = (4.5, 0.8), aspect = (0.4, 1.5), depth = (2.0, 75.0),
+                 overlap_fraction = 0.5, seed = 0):
+        self.num_frames = num_frames
+        self.boxes_per_frame = boxes_per_frame
+        self.objects_per_frame = objects_per_frame
+        self.box_size = box_size
+        self.aspect = aspect
+        self.depth = depth
+        self.overlap_fraction = overlap_fraction
+        self.seed = seed
+
+    def random_boxes(self, rng, count):
+        """Return count random boxes [x0, y0, x1, y1] inside the frame."""
+        width = np.clip(np.exp(rng.normal(self.box_size[0], self.box_size[1], count)), 4, FRAME_WIDTH)
+        height = np.clip(width * rng.uniform(self.aspect[0], self.aspect[1], count), 4, FRAME_HEIGHT)
+        x0 = rng.uniform(0, FRAME_WIDTH - width)
+        y0 = rng.uniform(0, FRAME_HEIGHT - height)
+        return np.stack([x0, y0, x0 + width, y0 + height], axis=1).astype(np.int64)
+
+    def frame(self, rng):
+        """Generate the ground truth and cluster boxes of one frame.
+
+        Returns:
+            A tuple (ground_truth, clusters) of lists in the json format.
+        """
+        num_objects = max(1, rng.poisson(self.objects_per_frame))
+        objects = self.random_boxes(rng, num_objects)
+        object_depth = rng.uniform(self.depth[0], self.depth[1], num_objects)
+
+        num_clusters = max(1, rng.poisson(self.boxes_per_frame))
+        num_object_clusters = int(round(num_clusters * self.overlap_fraction))
+
+        # clusters around an object: jittered sub-boxes overlapping each other
+        owner = rng.integers(0, num_objects, num_object_clusters)
+        size = np.stack([objects[owner, 2] - objects[owner, 0],
+                         objects[owner, 3] - objects[owner, 1]], axis=1)
+        start = objects[owner, 0:2] + (rng.uniform(-0.1, 0.5, (num_object_clusters, 2)) * size)
+        end = start + rng.uniform(0.3, 0.7, (num_object_clusters, 2)) * size
+        object_clusters = np.concatenate([start, end], axis=1).astype(np.int64)
+        object_cluster_depth = object_depth[owner] + rng.normal(0, 1.0, num_object_clusters)
+
+        clutter = self.random_boxes(rng, num_clusters - num_object_clusters)
+        clutter_depth = rng.uniform(self.depth[0], self.depth[1], len(clutter))
+
+        clusters = np.concatenate([object_clusters, clutter])
+        clusters[:, [0, 2]] = np.clip(clusters[:, [0, 2]], 0, FRAME_WIDTH)
+        clusters[:, [1, 3]] = np.clip(clusters[:, [1, 3]], 0, FRAME_HEIGHT)
+        clusters[:, 2] = np.maximum(clusters[:, 2], clusters[:, 0] + 1)
+        clusters[:, 3] = np.maximum(clusters[:, 3], clusters[:, 1] + 1)
+        cluster_depth = np.clip(np.concatenate([object_cluster_depth, clutter_depth]), 0.5, 99.0)
+
+        order = rng.permutation(len(clusters))
+        cluster_ids = rng.integers(0, 1000, len(clusters))
+        cluster_list = [box + [depth, cluster_id] for box, depth, cluster_id in zip(
+            clusters[order].tolist(), cluster_depth[order].round(8).tolist(),
+            cluster_ids.tolist())]
+
+        ids = ["".join(ID_CHARACTERS[rng.integers(0, len(ID_CHARACTERS), 22)]) for _ in range(num_objects)]
+        extra = rng.normal(0, 20, (num_objects, 4)).tolist()
+        ground_truth = [box + [depth, object_id] + values for box, depth, object_id, values in zip(
+            objects.tolist(), object_depth.tolist(), ids, extra)]
+        return ground_truth, cluster_list
+
+    def write(self, output_directory, frames = False):
+        """Write the json files and, if frames is set, placeholder frames.
+
+        The json files are written one frame at a time, so the whole dataset is
+        never held in memory.
+        """
+        os.makedirs(output_directory, exist_ok=True)
+        rng = np.random.default_rng(self.seed)
+        placeholder = None
+        if frames:
+            ok, placeholder = cv2.imencode(".png", np.zeros((FRAME_HEIGHT, FRAME_WIDTH, 3), np.uint8))
+            placeholder = placeholder.tobytes()
+
+        with open(os.path.join(output_directory, "depth_clustering_detection_flat.json"), 'w') as detection_file, \
+                open(os.path.join(output_directory, "waymo_ground_truth_flat.json"), 'w') as ground_truth_file:
+            detection_file.write("{")
+            ground_truth_file.write("{")
+            for i in range(self.num_frames):
+                name = "frame_camera_{:d}.png".format(i)
+                ground_truth, clusters = self.frame(rng)
+                separator = "\n" if i == 0 else ",\n"
+                detection_file.write(separator + json.dumps(name) + ": " + json.dumps(clusters))
+                ground_truth_file.write(separator + json.dumps(name) + ": " + json.dumps(ground_truth))
+                if placeholder is not None:
+                    with open(os.path.join(output_directory, name), 'wb') as frame_file:
+                        frame_file.write(placeholder)
+            detection_file.write("\n}\n")
+            ground_truth_file.write("\n}\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output_directory")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--boxes-per-frame", type=float, default=19)
+    parser.add_argument("--objects-per-frame", type=float, default=2)
+    parser.add_argument("--box-size", type=float, nargs=2, default=[4.5, 0.8],
+                        metavar=("LOG_MEAN", "LOG_STD"), help="log-normal box width in pixels")
+    parser.add_argument("--aspect", type=float, nargs=2, default=[0.4, 1.5], metavar=("LOW", "HIGH"),
+                        help="range of the height / width ratio")
+    parser.add_argument("--depth", type=float, nargs=2, default=[2.0, 75.0], metavar=("LOW", "HIGH"),
+                        help="range of the object depth in meters")
+    parser.add_argument("--overlap-fraction", type=float, default=0.5,
+                        help="fraction of clusters placed around objects, overlapping each other")
+    parser.add_argument("--placeholder-frames", action="store_true",
+                        help="also write a black png for every frame")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    dataset = SyntheticDataset(args.frames, args.boxes_per_frame, args.objects_per_frame,
+                               tuple(args.box_size), tuple(args.aspect), tuple(args.depth),
+                               args.overlap_fraction, args.seed)
+    dataset.write(args.output_directory, args.placeholder_frames)
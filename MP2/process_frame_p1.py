@@ -3,7 +3,7 @@ from scheduling.TaskEntity import *
 
 
 # read the input cluster box data from file
-box_info = read_json_file('../dataset/depth_clustering_detection_flat.json')
+box_info = load_box_info('../dataset/depth_clustering_detection_flat.json')
 
 
 def process_frame(frame):
@@ -1,10 +1,11 @@
 from scheduling.misc import *
 from scheduling.TaskEntity import *
+from scheduling.box_merge import merge_boxes
 import numpy as np
 
 
 # read the input cluster box data from file
-box_info = read_json_file('../dataset/depth_clustering_detection_flat.json')
+box_info = load_box_info('../dataset/depth_clustering_detection_flat.json')
 
 def box_area(cluster):
     l = abs(cluster[2] - cluster[0])
@@ -31,32 +32,14 @@ def process_frame(frame):
 
     task_batches = []
 
-    known_boxes = []
     avg_box = []
     
     #student's code here
     for cluster in cluster_boxes_data:
         avg_box.append(box_area(cluster))
-        tmp_coord = []
-        tmp_coord.append(cluster[0])
-        tmp_coord.append(cluster[1])
-        tmp_coord.append(cluster[2])
-        tmp_coord.append(cluster[3])
-        task_addressed = False
-        for box in known_boxes:
-            if (((cluster[1] >= box[1]) and (cluster[1] <= box[3])) or ((cluster[3] >= box[1]) and (cluster[3] <= box[3]))) and (((cluster[0] >= box[0]) and (cluster[0] <= box[2])) or ((cluster[2] >= box[0]) and (cluster[2] <= box[0]))):
-                tmp_box = []
-                tmp_box.append(min(cluster[0], box[0]))
-                tmp_box.append(min(cluster[1], box[1]))
-                tmp_box.append(max(cluster[2], box[2]))
-                tmp_box.append(max(cluster[3], box[3]))
-                tmp_box.append(cluster[4])
-                box = tmp_box
-                task_addressed = True
-                break
-        if not(task_addressed):
-            tmp_coord.append(cluster[4])
-            known_boxes.append(tmp_coord)
+
+    # merge overlapping cluster boxes, keeping the depth of the nearest one
+    known_boxes = merge_boxes(cluster_boxes_data, depth = "min")
 
     avg_area = np.mean(avg_box)
     sd_area = np.std(avg_box)
@@ -0,0 +1,68 @@
+import heapq
+
+
+def latest_start(task_batch):
+    """Return the last time the task batch can start and still meet a deadline.
+
+    A task batch starting at time t finishes with a response time of
+    t + remain_time - enqueue_time for each task. The latest start is taken for
+    the task with the latest deadline, so a batch is only given up when none of
+    its tasks can make it.
+    """
+    deadline = max(task.enqueue_time + task.deadline for task in task_batch.tasks)
+    return deadline - task_batch.remain_time
+
+
+class AdmissionControl:
+    """Reject and expire task batches that can no longer meet their deadline.
+
+    admit() rejects a task batch that could not meet its deadline even if it
+    started right away. Admitted task batches are kept in a heap by latest
+    start time, and expire() removes from the run queue those whose latest
+    start time has passed, so the check costs O(log n) per task batch.
+
+    Attributes:
+        dispatcher: the dispatcher the admitted task batches are queued in.
+        heap: entries [latest start time, sequence number, task batch].
+        counter: sequence number of the next heap entry.
+    """
+    def __init__(self, dispatcher):
+        self.dispatcher = dispatcher
+        self.heap = []
+        self.counter = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def admit(self, task_batch, time):
+        """Return True if the task batch can meet its deadline when queued at time."""
+        start = latest_start(task_batch)
+        if start < time:
+            return False
+        heapq.heappush(self.heap, [start, self.counter, task_batch])
+        self.counter = self.counter + 1
+        return True
+
+    def expire(self, time):
+        """Remove the waiting task batches that cannot start by time anymore.
+
+        A preempted task batch has less work left than when it was admitted, so
+        its latest start is computed again before it is expired. Task batches in
+        flight or finished are forgotten.
+
+        Returns:
+            The expired task batches.
+        """
+        expired = []
+        while self.heap and self.heap[0][0] < time:
+            entry = heapq.heappop(self.heap)
+            task_batch = entry[2]
+            if task_batch.remain_time == 0:
+                continue
+            start = latest_start(task_batch)
+            if start >= time:
+                entry[0] = start
+                heapq.heappush(self.heap, entry)
+            elif self.dispatcher.remove(task_batch):
+                expired.append(task_batch)
+        return expired
@@ -0,0 +1,204 @@
+import math
+from scheduling.TaskEntity import TaskBatch
+
+
+class PendingBatch:
+    """Tasks of one shape and priority waiting in the BatchFormer.
+
+    Attributes:
+        tasks: the waiting tasks, in arrival order.
+        img_height: height of the crops.
+        img_width: width of the crops.
+        priority: priority of the tasks.
+        deadline: earliest absolute deadline of the tasks.
+    """
+    def __init__(self, img_height, img_width, priority):
+        self.tasks = []
+        self.img_height = img_height
+        self.img_width = img_width
+        self.priority = priority
+        self.deadline = None
+
+    def form(self):
+        """Return the waiting tasks as one TaskBatch.
+
+        Each task keeps its own enqueue_time. The batch is enqueued as of its
+        earliest task, and its deadline is the earliest absolute deadline.
+        """
+        task_batch = TaskBatch(self.tasks, self.img_height, self.img_width, self.priority)
+        task_batch.enqueue_time = min(task.enqueue_time for task in self.tasks)
+        task_batch.deadline = self.deadline - task_batch.enqueue_time
+        return task_batch
+
+
+class BatchFormer:
+    """Group same-shape task batches across frames before they are queued.
+
+    Task batches of a held shape do not go to the run queue directly: their
+    tasks wait with the other tasks of the same (img_height, img_width,
+    priority). The waiting tasks are released as one TaskBatch when they reach
+    max_batch_size, or when waiting longer could make the earliest deadline
+    miss. Their latest release time is the deadline minus the margin and the
+    time the batch would take to finish if queued, as estimated by
+    response_time, which counts the queued work and the work of the frames
+    arriving meanwhile that runs first. It is estimated for the batch grown by
+    the tasks the next frame is expected to add, as many as the last frame
+    brought, since holding the batch is what lets them join. New tasks only join at frame
+    arrivals, so the tasks are released at the last frame arrival before it
+    rather than at the last moment: holding them longer would batch nothing
+    more, and the slack left absorbs errors of the estimate.
+
+    By default only the task batches worth holding are held: batching their
+    shape must cost less than running the tasks apart, according to the cost
+    model, and the same shape and priority must have come with the previous
+    frame too, so that a next task batch is likely to join them. A one-off
+    shape would only be held until its deadline for nothing.
+
+    Attributes:
+        max_batch_size: number of tasks released as soon as they are waiting.
+        shapes: the (img_height, img_width) held by the former, or None to hold
+                the recurring shapes that batch well. Other task batches pass
+                through unchanged.
+        margin: time units kept between the release and the latest release time,
+                to absorb errors of the response time estimate.
+        cost_model: the execution time model, set by the Scheduler when None.
+        response_time: function returning the time a task batch would take to
+                finish if it was queued now, set by the Scheduler when None.
+                Without it, the modeled execution time of the batch is used.
+        frame_period: time between frame arrivals, set by the Scheduler when
+                None. Without it the tasks are held until their latest release.
+        pending: the PendingBatch of each (img_height, img_width, priority).
+        frame_time: enqueue time of the last task batch added.
+        frame_tasks: the tasks of each (img_height, img_width, priority) added
+                at frame_time.
+        previous_keys: the (img_height, img_width, priority) added at the
+                enqueue time before frame_time.
+    """
+    def __init__(self, max_batch_size = 8, shapes = None, margin = 0, cost_model = None,
+                 response_time = None, frame_period = None):
+        self.max_batch_size = max_batch_size
+        self.shapes = None if shapes is None else set(shapes)
+        self.margin = margin
+        self.cost_model = cost_model
+        self.response_time = response_time
+        self.frame_period = frame_period
+        self.pending = {}
+        self.frame_time = None
+        self.frame_tasks = {}
+        self.previous_keys = set()
+
+    def __len__(self):
+        return sum(len(pending.tasks) for pending in self.pending.values())
+
+    def empty(self):
+        """Return True if no task is waiting."""
+        return not self.pending
+
+    def holds(self, task_batch):
+        """Return True if the task batch is grouped by the former."""
+        if task_batch.batch_size == 0:
+            return False
+        if self.shapes is not None:
+            return (task_batch.img_height, task_batch.img_width) in self.shapes
+        key = (task_batch.img_height, task_batch.img_width, task_batch.priority)
+        if key not in self.pending and key not in self.previous_keys:
+            return False
+        return self.batches_well(task_batch)
+
+    def batches_well(self, task_batch):
+        """Return True if two tasks of the shape cost less batched than apart."""
+        task = task_batch.tasks[0]
+        single = TaskBatch([task], task_batch.img_height, task_batch.img_width, task_batch.priority)
+        pair = TaskBatch([task, task], task_batch.img_height, task_batch.img_width, task_batch.priority)
+        return self.cost_model(pair) < 2 * self.cost_model(single)
+
+    def expected_batch(self, pending):
+        """Return the waiting tasks and those the next frame is expected to add as one TaskBatch.
+
+        The tasks of the last frame stand for the expected ones. remain_time is
+        set to the modeled execution time of the batch.
+        """
+        key = (pending.img_height, pending.img_width, pending.priority)
+        tasks = pending.tasks + self.frame_tasks.get(key, [])
+        task_batch = TaskBatch(tasks[:self.max_batch_size], *key)
+        task_batch.enqueue_time = min(task.enqueue_time for task in pending.tasks)
+        task_batch.deadline = pending.deadline - task_batch.enqueue_time
+        task_batch.remain_time = self.cost_model(task_batch)
+        return task_batch
+
+    def release_time(self, pending):
+        """Return the latest time at which the waiting tasks can be released as a batch."""
+        task_batch = self.expected_batch(pending)
+        if self.response_time is not None:
+            response = self.response_time(task_batch)
+        else:
+            response = task_batch.remain_time
+        return pending.deadline - self.margin - response
+
+    def add(self, task_batch):
+        """Add an enqueued task batch.
+
+        The tasks must have their enqueue_time set.
+
+        Returns:
+            The task batches ready to be queued: the task batch itself if its
+            shape is not held, and any batch that reached max_batch_size.
+        """
+        key = (task_batch.img_height, task_batch.img_width, task_batch.priority)
+        if task_batch.batch_size:
+            # the shapes of the previous frame tell which ones recur
+            time = task_batch.tasks[0].enqueue_time
+            if time != self.frame_time:
+                self.previous_keys = set(self.frame_tasks)
+                self.frame_tasks = {}
+                self.frame_time = time
+            self.frame_tasks.setdefault(key, []).extend(task_batch.tasks)
+
+        if not self.holds(task_batch):
+            return [task_batch]
+
+        ready = []
+        for task in task_batch.tasks:
+            pending = self.pending.get(key)
+            if pending is None:
+                pending = self.pending[key] = PendingBatch(*key)
+            pending.tasks.append(task)
+            deadline = task.enqueue_time + task.deadline
+            if pending.deadline is None or deadline < pending.deadline:
+                pending.deadline = deadline
+
+            if len(pending.tasks) >= self.max_batch_size:
+                ready.append(self.pending.pop(key).form())
+        return ready
+
+    def release(self, time, flush = False):
+        """Return the task batches that must be queued by the given time.
+
+        Args:
+            time: the current time.
+            flush: release every waiting task, e.g. once no frame will arrive.
+        """
+        ready = []
+        if self.frame_period:
+            # the waiting tasks cannot wait for the next frame arrival
+            horizon = (time // self.frame_period + 1) * self.frame_period
+        else:
+            horizon = time + 1
+        for key in list(self.pending):
+            if flush or self.release_time(self.pending[key]) < horizon:
+                ready.append(self.pending.pop(key).form())
+        return ready
+
+    def next_release(self):
+        """Return the earliest time at which release() returns waiting tasks, or None.
+
+        The release times only change when task batches are queued, start or
+        finish, so it holds until the next of these events.
+        """
+        if not self.pending:
+            return None
+        latest = min(self.release_time(pending) for pending in self.pending.values())
+        if self.frame_period and not math.isinf(latest):
+            # the frame arrival after which the next one comes too late
+            return latest // self.frame_period * self.frame_period
+        return latest
@@ -0,0 +1,140 @@
+"""Indexed binary store for cluster box and ground truth json files.
+
+Convert the json files once from the MP2 directory with
+
+    python -m scheduling.BoxStore ../dataset/depth_clustering_detection_flat.json \
+        ../dataset/waymo_ground_truth_flat.json
+"""
+import json
+import os
+import sys
+import numpy as np
+
+
+BOX_DTYPE = np.dtype([
+    ("x0", np.int32),
+    ("y0", np.int32),
+    ("x1", np.int32),
+    ("y1", np.int32),
+    ("depth", np.float64),
+    ("box_id", np.int64),
+])
+
+
+def store_paths(json_path):
+    """Return the paths of the box array, offset table and frame names for json_path."""
+    prefix = os.path.splitext(json_path)[0]
+    return prefix + ".boxes.npy", prefix + ".offsets.npy", prefix + ".frames.json"
+
+
+def convert_box_json(json_path):
+    """Convert a json file of boxes per frame into an indexed binary store.
+
+    All boxes are written to one contiguous array, frame after frame, with an
+    offset table giving the first box of each frame. Only the coordinates, the
+    depth and the sixth field (the cluster id, if it is an integer, -1 otherwise)
+    are kept.
+
+    Args:
+        json_path: path of a json file such as depth_clustering_detection_flat.json.
+
+    Returns:
+        The number of boxes written.
+    """
+    with open(json_path) as json_file:
+        data = json.load(json_file)
+
+    names = list(data)
+    offsets = np.zeros(len(names) + 1, dtype=np.int64)
+    boxes = np.zeros(sum(len(data[name]) for name in names), dtype=BOX_DTYPE)
+    k = 0
+    for i, name in enumerate(names):
+        for entry in data[name]:
+            box_id = entry[5] if len(entry) > 5 and isinstance(entry[5], int) else -1
+            boxes[k] = (entry[0], entry[1], entry[2], entry[3], entry[4], box_id)
+            k += 1
+        offsets[i + 1] = k
+
+    boxes_path, offsets_path, frames_path = store_paths(json_path)
+    np.save(boxes_path, boxes)
+    np.save(offsets_path, offsets)
+    with open(frames_path, 'w') as outfile:
+        json.dump(names, outfile)
+    return len(boxes)
+
+
+class BoxStore:
+    """Read-only access to boxes converted by convert_box_json().
+
+    The box array and offset table are memory-mapped, so opening a store does
+    not read the boxes, and get() returns a zero-copy view of a frame's boxes.
+    The store can be used in place of the dictionary read from the json file:
+    it supports `in`, iteration over frame names and store[name], which returns
+    the boxes of a frame as lists [x0, y0, x1, y1, depth, box_id].
+
+    Attributes:
+        json_path: the json file the store was converted from.
+        mmap: whether the arrays are memory-mapped.
+        boxes: structured array of all boxes with BOX_DTYPE.
+        offsets: boxes of frame i are boxes[offsets[i]:offsets[i+1]].
+        names: frame names, in store order.
+        index: position of each frame name.
+    """
+    def __init__(self, json_path, mmap = True):
+        self.json_path = json_path
+        self.mmap = mmap
+        boxes_path, offsets_path, frames_path = store_paths(json_path)
+        mmap_mode = 'r' if mmap else None
+        self.boxes = np.load(boxes_path, mmap_mode=mmap_mode)
+        self.offsets = np.load(offsets_path, mmap_mode=mmap_mode)
+        with open(frames_path) as frames_file:
+            self.names = json.load(frames_file)
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __getstate__(self):
+        # pickled by path, the arrays are loaded again when unpickled
+        return {"json_path": self.json_path, "mmap": self.mmap}
+
+    def __setstate__(self, state):
+        self.__init__(state["json_path"], state["mmap"])
+
+    def __getitem__(self, name):
+        return self.rows(name)
+
+    def get(self, name):
+        """Return a zero-copy view of the boxes of a frame."""
+        i = self.index[name]
+        return self.boxes[self.offsets[i]:self.offsets[i + 1]]
+
+    def rows(self, name):
+        """Return the boxes of a frame as lists of Python numbers."""
+        return [list(row) for row in self.get(name).tolist()]
+
+
+def load_box_info(json_path):
+    """Return a BoxStore for json_path if it was converted, else the json dictionary.
+
+    The store is only used if it is at least as recent as the json file.
+    """
+    boxes_path = store_paths(json_path)[0]
+    if os.path.exists(boxes_path) and os.path.getmtime(boxes_path) >= os.path.getmtime(json_path):
+        return BoxStore(json_path)
+    with open(json_path) as json_file:
+        return json.load(json_file)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("usage: python -m scheduling.BoxStore json_file [json_file ...]")
+    for path in sys.argv[1:]:
+        count = convert_box_json(path)
+        print("{:s}: {:d} boxes converted".format(path, count))
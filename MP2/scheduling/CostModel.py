@@ -0,0 +1,215 @@
+"""Execution time models of task batches.
+
+A cost model is called with a TaskBatch and returns its execution time in
+simulated time units. LinearCostModel is the formula the scheduler has always
+used. TableCostModel interpolates execution times measured on a grid of
+(height, width, batch_size), so batching efficiency follows the hardware.
+
+Calibrate a table on the local CPU from the MP2 directory, e.g.
+
+    python -m scheduling.CostModel cost_table.json --heights 32 128 512 --batch-sizes 1 2 4 8
+"""
+from abc import ABC, abstractmethod
+import argparse
+import json
+import math
+import time
+import numpy as np
+
+
+class CostModel(ABC):
+    """Base class of the execution time models.
+
+    Subclasses implement estimate(). Calling the model with a TaskBatch returns
+    the execution time of the batch.
+    """
+    def __call__(self, task_batch):
+        return self.estimate(task_batch.img_height, task_batch.img_width, task_batch.batch_size)
+
+    @abstractmethod
+    def estimate(self, img_height, img_width, batch_size):
+        """Return the execution time of a batch of batch_size crops of the given size."""
+
+
+class LinearCostModel(CostModel):
+    """Execution time linear in the crop area and the batch size.
+
+    With the default parameters this is the formula
+    int(5e-5 * h * w + (batch_size-1) * 2) + 1.
+
+    Attributes:
+        per_pixel: time units per pixel of one crop.
+        per_task: time units added by each task after the first one.
+        base: time units added to every batch.
+    """
+    def __init__(self, per_pixel = 5e-5, per_task = 2, base = 1):
+        self.per_pixel = per_pixel
+        self.per_task = per_task
+        self.base = base
+
+    def estimate(self, img_height, img_width, batch_size):
+        return int(self.per_pixel * img_height * img_width + (batch_size-1) * self.per_task) + self.base
+
+
+def axis_weights(grid, value):
+    """Return (index, fraction) to interpolate value between grid[index] and grid[index+1].
+
+    Values outside the grid are extrapolated from the nearest segment.
+    """
+    if len(grid) == 1:
+        return 0, 0.0
+    i = int(np.searchsorted(grid, value, side="right")) - 1
+    i = min(max(i, 0), len(grid) - 2)
+    return i, (value - grid[i]) / (grid[i + 1] - grid[i])
+
+
+class TableCostModel(CostModel):
+    """Execution times interpolated from a measured table.
+
+    The table holds the measured seconds of a batch for every (height, width,
+    batch_size) of a grid. Other sizes are interpolated trilinearly, and
+    extrapolated linearly outside the grid. Results are memoized per size, since
+    a run only sees a few distinct batch shapes.
+
+    Attributes:
+        heights: increasing crop heights of the grid.
+        widths: increasing crop widths of the grid.
+        batch_sizes: increasing batch sizes of the grid.
+        seconds: measured seconds, an array of shape (heights, widths, batch_sizes).
+        time_unit_ms: length of a simulated time unit in milliseconds.
+        cache: memoized execution times by (height, width, batch_size).
+    """
+    def __init__(self, heights, widths, batch_sizes, seconds, time_unit_ms = 1.0):
+        self.heights = np.asarray(heights, dtype=np.float64)
+        self.widths = np.asarray(widths, dtype=np.float64)
+        self.batch_sizes = np.asarray(batch_sizes, dtype=np.float64)
+        self.seconds = np.asarray(seconds, dtype=np.float64)
+        self.time_unit_ms = time_unit_ms
+        self.cache = {}
+
+    def interpolate(self, img_height, img_width, batch_size):
+        """Return the interpolated seconds of a batch."""
+        (i, a), (j, b), (k, c) = (axis_weights(self.heights, img_height),
+                                  axis_weights(self.widths, img_width),
+                                  axis_weights(self.batch_sizes, batch_size))
+        cube = self.seconds[i:i + 2, j:j + 2, k:k + 2]
+        # collapse one axis at a time; a grid with a single point on an axis has no second slice
+        for fraction in (a, b, c):
+            if cube.shape[0] == 2:
+                cube = cube[0] + (cube[1] - cube[0]) * fraction
+            else:
+                cube = cube[0]
+        return max(float(cube), 0.0)
+
+    def estimate(self, img_height, img_width, batch_size):
+        key = (img_height, img_width, batch_size)
+        units = self.cache.get(key)
+        if units is None:
+            seconds = self.interpolate(img_height, img_width, batch_size)
+            units = max(1, math.ceil(seconds * 1000 / self.time_unit_ms))
+            self.cache[key] = units
+        return units
+
+    def to_dict(self):
+        return {"heights": self.heights.tolist(), "widths": self.widths.tolist(),
+                "batch_sizes": self.batch_sizes.tolist(), "seconds": self.seconds.tolist(),
+                "time_unit_ms": self.time_unit_ms}
+
+    def save(self, path):
+        """Write the table to a json file."""
+        with open(path, 'w') as outfile:
+            json.dump(self.to_dict(), outfile, indent=4)
+
+    @classmethod
+    def load(cls, path):
+        """Read a table written by save()."""
+        with open(path) as infile:
+            table = json.load(infile)
+        return cls(table["heights"], table["widths"], table["batch_sizes"], table["seconds"],
+                   table.get("time_unit_ms", 1.0))
+
+
+FEATURE_SIZE = 32
+# fixed random weights of the classify_batch() stand-in classifier, see classifier_weights()
+classifier_weight_cache = {}
+
+
+def classifier_weights():
+    """Return the weights of classify_batch(), created on first use.
+
+    Simulations import this module for the cost models only, so they do not
+    pay for the weight matrix.
+    """
+    if "weights" not in classifier_weight_cache:
+        classifier_weight_cache["weights"] = np.random.default_rng(0).standard_normal(
+            (FEATURE_SIZE * FEATURE_SIZE * 3, 256)).astype(np.float32)
+    return classifier_weight_cache["weights"]
+
+
+def classify_batch(batch):
+    """A CPU stand-in for a classifier, used to calibrate TableCostModel.
+
+    Normalizes the crops, pools them to FEATURE_SIZE x FEATURE_SIZE and applies
+    one dense layer to the whole batch at once, so its cost grows with the crop
+    area and amortizes over the batch like a real backend.
+
+    Args:
+        batch: a uint8 array of shape (batch_size, height, width, 3).
+    """
+    batch_size, height, width, _ = batch.shape
+    pixels = batch.astype(np.float32) / 255
+    rows = np.linspace(0, height, FEATURE_SIZE + 1).astype(np.int64)[:-1]
+    cols = np.linspace(0, width, FEATURE_SIZE + 1).astype(np.int64)[:-1]
+    pooled = np.add.reduceat(np.add.reduceat(pixels, rows, axis=1), cols, axis=2)
+    return pooled.reshape(batch_size, -1) @ classifier_weights()
+
+
+def calibrate(heights, widths, batch_sizes, workload = classify_batch, repeat = 5,
+              time_unit_ms = 1.0, seed = 0):
+    """Measure workload on random crops over a grid and return a TableCostModel.
+
+    Each grid point keeps the fastest of repeat runs, after one warm-up run.
+    """
+    rng = np.random.default_rng(seed)
+    seconds = np.zeros((len(heights), len(widths), len(batch_sizes)))
+    for i, height in enumerate(heights):
+        for j, width in enumerate(widths):
+            for k, batch_size in enumerate(batch_sizes):
+                batch = rng.integers(0, 256, (batch_size, height, width, 3), dtype=np.uint8)
+                workload(batch)
+                best = math.inf
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    workload(batch)
+                    best = min(best, time.perf_counter() - start)
+                seconds[i, j, k] = best
+    return TableCostModel(heights, widths, batch_sizes, seconds, time_unit_ms)
+
+
+COST_MODELS = {
+    "linear": LinearCostModel,
+}
+
+
+def get_cost_model(model):
+    """Return a cost model from a model, a name in COST_MODELS or a table json path."""
+    if not isinstance(model, str):
+        return model
+    if model in COST_MODELS:
+        return COST_MODELS[model]()
+    return TableCostModel.load(model)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrate a TableCostModel on this machine.")
+    parser.add_argument("output")
+    parser.add_argument("--heights", type=int, nargs="+", default=[16, 64, 128, 256, 512, 1280])
+    parser.add_argument("--widths", type=int, nargs="+", default=[16, 64, 128, 256, 512, 1920])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--time-unit-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    model = calibrate(args.heights, args.widths, args.batch_sizes, repeat = args.repeat,
+                      time_unit_ms = args.time_unit_ms)
+    model.save(args.output)
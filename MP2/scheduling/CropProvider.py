@@ -0,0 +1,182 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+import threading
+import cv2
+import numpy as np
+
+
+class FrameCache:
+    """Decoded frames kept in least recently used order within a byte budget.
+
+    Attributes:
+        byte_budget: maximum number of bytes of decoded frames kept. The most
+                recently used frame is always kept, even if it alone is larger.
+        read_frame: function decoding the frame at a path. Default is cv2.imread.
+        frames: the decoded frames by path, least recently used first.
+        size: number of bytes of the decoded frames kept.
+        hits: number of get() calls served without decoding, from the cache or
+                by waiting for another thread's decode.
+        misses: number of get() calls that decoded the frame.
+        decoding: a Future of each frame being decoded, by path, so a frame
+                requested by several threads at once is decoded only once.
+        lock: protects the cache state. Frames are decoded outside of it, so
+                threads decode different frames in parallel.
+    """
+    def __init__(self, byte_budget = 256 << 20, read_frame = cv2.imread):
+        self.byte_budget = byte_budget
+        self.read_frame = read_frame
+        self.frames = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.decoding = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __contains__(self, path):
+        return path in self.frames
+
+    def get(self, path):
+        """Return the decoded frame at path, decoding it on a miss.
+
+        A thread asking for a frame another thread is decoding waits for it.
+        """
+        with self.lock:
+            frame = self.frames.get(path)
+            if frame is not None:
+                self.hits = self.hits + 1
+                self.frames.move_to_end(path)
+                return frame
+            future = self.decoding.get(path)
+            if future is None:
+                self.misses = self.misses + 1
+                future = self.decoding[path] = Future()
+                owner = True
+            else:
+                self.hits = self.hits + 1
+                owner = False
+
+        if not owner:
+            return future.result()
+
+        try:
+            frame = self.read_frame(path)
+            if frame is None:
+                raise FileNotFoundError(path)
+        except BaseException as error:
+            with self.lock:
+                del self.decoding[path]
+            future.set_exception(error)
+            raise
+
+        with self.lock:
+            del self.decoding[path]
+            self.insert(path, frame)
+        future.set_result(frame)
+        return frame
+
+    def insert(self, path, frame):
+        """Add a decoded frame and evict the least recently used ones over the budget.
+
+        The caller holds the lock.
+        """
+        self.frames[path] = frame
+        self.size = self.size + frame.nbytes
+        while self.size > self.byte_budget and len(self.frames) > 1:
+            _, evicted = self.frames.popitem(last=False)
+            self.size = self.size - evicted.nbytes
+
+    def clear(self):
+        """Drop every cached frame."""
+        self.frames.clear()
+        self.size = 0
+
+
+class CropProvider:
+    """Serve the pixels of tasks and task batches from a FrameCache.
+
+    The frame of a task is decoded once and shared by all its tasks: crop()
+    returns a view into the cached frame, so no pixels are copied. assemble()
+    copies each task's view once, straight into its slot of a contiguous batch
+    array, which is reused between batches of the same shape.
+
+    Attributes:
+        cache: the FrameCache holding the decoded frames.
+        pad_value: value of the batch pixels outside a crop or outside the frame.
+        buffers: thread-local reusable batch arrays, by shape.
+    """
+    def __init__(self, cache = None, pad_value = 0):
+        if cache is None:
+            cache = FrameCache()
+        self.cache = cache
+        self.pad_value = pad_value
+        self.buffers = threading.local()
+
+    def crop(self, task):
+        """Return a view of the task's region of interest in its frame.
+
+        The region is clipped to the frame, since batched boxes may extend past
+        its border, and is empty if the box lies outside it. A task without
+        coord gets the whole frame.
+        """
+        frame = self.cache.get(task.image_path)
+        if not task.coord:
+            return frame
+        x0, y0, x1, y1 = task.coord
+        height, width = frame.shape[:2]
+        # a negative stop would count from the far border, so it is clamped to 0
+        return frame[max(y0, 0):max(min(y1, height), 0), max(x0, 0):max(min(x1, width), 0)]
+
+    def batch_shape(self, task_batch):
+        """Return the (height, width) of the crops of a task batch.
+
+        This is the batch's img_height x img_width, enlarged if a task's box is
+        larger, so no pixel is cut.
+        """
+        height = max([task_batch.img_height] + [task.img_height for task in task_batch.tasks])
+        width = max([task_batch.img_width] + [task.img_width for task in task_batch.tasks])
+        return height, width
+
+    def assemble(self, task_batch, out = None):
+        """Return the crops of a task batch as one contiguous array.
+
+        Each crop is copied once into out[i], at its offset in the padded
+        region, so the parts of a box outside the frame stay padded.
+
+        Args:
+            task_batch: the task batch.
+            out: a uint8 array of shape (batch_size, height, width, channels) to
+                    fill. Default is a buffer reused for batches of this shape
+                    in the calling thread; it is overwritten by the next one.
+
+        Returns:
+            The filled array.
+        """
+        height, width = self.batch_shape(task_batch)
+        if out is None:
+            frame = self.cache.get(task_batch.tasks[0].image_path)
+            shape = (task_batch.batch_size, height, width) + frame.shape[2:]
+            buffers = self.buffers.__dict__
+            out = buffers.get(shape)
+            if out is None:
+                out = buffers[shape] = np.empty(shape, dtype=frame.dtype)
+        out.fill(self.pad_value)
+
+        for i, task in enumerate(task_batch.tasks):
+            view = self.crop(task)
+            top = max(-task.coord[1], 0) if task.coord else 0
+            left = max(-task.coord[0], 0) if task.coord else 0
+            out[i, top:top + view.shape[0], left:left + view.shape[1]] = view
+        return out
+
+    def work(self, classify):
+        """Return a function running classify on the assembled crops of a task batch.
+
+        It can be given as the work of a RealTimeScheduler, e.g. with
+        CostModel.classify_batch.
+        """
+        def run(task_batch):
+            return classify(self.assemble(task_batch))
+        return run
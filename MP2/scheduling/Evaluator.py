@@ -0,0 +1,122 @@
+from scheduling.misc import get_statistics_per_image, read_history_jsonl
+from scheduling.BoxStore import load_box_info
+
+
+class OnlineEvaluator:
+    """Coverage and accuracy of the scheduled cluster boxes, updated as they arrive.
+
+    The scheduler feeds the cluster boxes of every enqueued task set to add().
+    Only the frame receiving boxes is evaluated again, with
+    get_statistics_per_image(), and its previous contribution to the running
+    totals is replaced. The scheduled boxes are copied, so they do not get the
+    sixth field get_statistics() adds.
+
+    A pickled evaluator given the path of its ground truth stores the path and
+    loads the ground truth again when unpickled. With a log, the results of
+    complete frames are streamed to it instead of being kept, so the pickled
+    state does not grow with the number of frames.
+
+    Attributes:
+        ground_truth: the ground truth boxes by frame name, a dictionary or a BoxStore.
+        path: the json file the ground truth was loaded from, or None.
+        boxes: the scheduled cluster boxes by frame name, for the frames that
+                may still receive boxes.
+        frames: the [coverage list, accuracy] of each evaluated frame, except
+                the complete frames written to log.
+        log: a JsonlHistoryWriter the results of complete frames are written to,
+                or None (default).
+        coverage_sum: sum of the coverage of all evaluated ground truth boxes.
+        coverage_count: number of evaluated ground truth boxes.
+        accuracy_sum: sum of the accuracy of all evaluated frames.
+    """
+    def __init__(self, ground_truth, path = None):
+        self.ground_truth = ground_truth
+        self.path = path
+        self.boxes = {}
+        self.frames = {}
+        self.log = None
+        self.coverage_sum = 0.0
+        self.coverage_count = 0
+        self.accuracy_sum = 0.0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.path is not None:
+            state["ground_truth"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.path is not None:
+            self.ground_truth = load_box_info(self.path)
+
+    def add(self, image_name, boxes, complete = False):
+        """Add cluster boxes [x0, y0, x1, y1, depth] of a frame and evaluate it again.
+
+        Args:
+            image_name: the frame name.
+            boxes: the new cluster boxes of the frame.
+            complete: whether the frame gets no more boxes, so its boxes need
+                    not be kept. The scheduler adds all the boxes of a frame at once.
+        """
+        if image_name in self.frames and image_name not in self.boxes:
+            raise ValueError(image_name + " was already evaluated as complete")
+        self.boxes.setdefault(image_name, []).extend(box[:5] for box in boxes)
+        if not self.boxes[image_name] or image_name not in self.ground_truth:
+            if complete:
+                del self.boxes[image_name]
+            return
+
+        previous = self.frames.get(image_name)
+        if previous is not None:
+            self.coverage_sum = self.coverage_sum - sum(previous[0])
+            self.coverage_count = self.coverage_count - len(previous[0])
+            self.accuracy_sum = self.accuracy_sum - previous[1]
+
+        # the sixth field is added to copies, the stored boxes stay unchanged
+        frame_boxes = {image_name: [box[:] for box in self.boxes[image_name]]}
+        result = get_statistics_per_image(image_name, self.ground_truth, frame_boxes)
+        self.frames[image_name] = result
+        self.coverage_sum = self.coverage_sum + sum(result[0])
+        self.coverage_count = self.coverage_count + len(result[0])
+        self.accuracy_sum = self.accuracy_sum + result[1]
+        if complete:
+            del self.boxes[image_name]
+            if self.log is not None:
+                self.log.write({"image": image_name, "coverage": result[0], "accuracy": result[1]})
+                del self.frames[image_name]
+
+    def coverage(self):
+        """Return the running average coverage of the ground truth boxes."""
+        if self.coverage_count == 0:
+            return 0
+        return self.coverage_sum / self.coverage_count
+
+    def accuracy(self):
+        """Return the running average accuracy of the frames."""
+        if not self.frames:
+            return 0
+        return self.accuracy_sum / len(self.frames)
+
+    def result(self):
+        """Return [coverage, accuracy], exactly as compute_statistics() would.
+
+        The frame results are summed again in ground truth order, so rounding
+        matches compute_statistics() on the same boxes.
+        """
+        frames = self.frames
+        if self.log is not None:
+            self.log.flush()
+            frames = dict(frames)
+            for entry in read_history_jsonl(self.log.path):
+                frames[entry["image"]] = [entry["coverage"], entry["accuracy"]]
+
+        coverage = []
+        accuracy = []
+        for image in self.ground_truth:
+            if image in frames:
+                coverage.extend(frames[image][0])
+                accuracy.append(frames[image][1])
+        if not coverage:
+            return [0, 0]
+        return [sum(coverage) / len(coverage), sum(accuracy) / len(accuracy)]
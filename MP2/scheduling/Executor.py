@@ -0,0 +1,188 @@
+from scheduling.RunQueue import RunQueue, priority_key
+
+
+class Executor:
+    """A simulated accelerator that runs one TaskBatch at a time.
+
+    Attributes:
+        executor_id: index of this executor in the scheduler.
+        entry: run queue entry of the task batch in flight, or None when idle.
+                It is kept so that a preempted task batch can be requeued at its
+                original position.
+        task_batch: the task batch in flight, or None when idle.
+        run_queue: local run queue, only used by WorkStealingDispatcher.
+        queued_time: sum of remain_time of the task batches in run_queue.
+        busy_time: number of time units this executor has spent running task batches.
+    """
+    def __init__(self, executor_id):
+        self.executor_id = executor_id
+        self.entry = None
+        self.task_batch = None
+        self.run_queue = None
+        self.queued_time = 0
+        self.busy_time = 0
+
+    def start(self, entry):
+        """Start running the task batch of the given run queue entry."""
+        self.entry = entry
+        self.task_batch = entry[2]
+
+    def stop(self):
+        """Stop the task batch in flight and return its run queue entry."""
+        entry = self.entry
+        self.entry = None
+        self.task_batch = None
+        return entry
+
+    def run(self, units):
+        """Run the task batch in flight for the given number of time units."""
+        self.task_batch.remain_time = self.task_batch.remain_time - units
+        self.busy_time = self.busy_time + units
+
+    def finish(self):
+        """Release the finished task batch and return it."""
+        return self.stop()[2]
+
+
+class GlobalDispatcher:
+    """All executors pull from one shared run queue.
+
+    An idle executor always takes the top task batch. When preempting, the
+    executor running the lowest priority task batch is preempted while the
+    top of the run queue has a higher priority, so the executors always run
+    the highest priority task batches.
+    """
+    def __init__(self, executors, key = priority_key):
+        self.executors = executors
+        self.key = key
+        self.run_queue = RunQueue(key)
+
+    def __len__(self):
+        return len(self.run_queue)
+
+    def __iter__(self):
+        """Iterate over the waiting task batches in no particular order."""
+        return iter(self.run_queue)
+
+    def empty(self):
+        """Return True if no task batch is waiting."""
+        return self.run_queue.empty()
+
+    def enqueue(self, task_set):
+        """Add the task batches of a frame."""
+        self.run_queue.put_all(task_set)
+
+    def remove(self, task_batch):
+        """Remove a waiting task batch. Return True if it was waiting."""
+        return self.run_queue.remove(task_batch)
+
+    def dispatch(self, preempt):
+        """Assign waiting task batches to the executors.
+
+        Args:
+            preempt: whether task batches in flight can be preempted.
+        """
+        for executor in self.executors:
+            if self.run_queue.empty():
+                break
+            if executor.task_batch is None:
+                executor.start(self.run_queue.get_entry())
+
+        if preempt:
+            # the key of a task batch in flight can change while it runs
+            for executor in self.executors:
+                if executor.task_batch is not None:
+                    executor.entry[0] = self.key(executor.task_batch)
+
+        while preempt and not self.run_queue.empty():
+            worst = max(self.executors, key=lambda executor: executor.entry)
+            if not self.run_queue.peek_entry() < worst.entry:
+                break
+            entry = worst.stop()
+            worst.start(self.run_queue.get_entry())
+            self.run_queue.put_entry(entry)
+
+
+class WorkStealingDispatcher:
+    """Each executor has its own run queue and steals work when it is empty.
+
+    The task batches of a frame are spread over the executors, each batch going
+    to the run queue with the least queued execution time. An idle executor with
+    an empty run queue takes the top task batch of the longest run queue.
+    Preemption only happens within an executor's own run queue.
+    """
+    def __init__(self, executors, key = priority_key):
+        self.executors = executors
+        self.key = key
+        for executor in executors:
+            executor.run_queue = RunQueue(key)
+
+    def __len__(self):
+        return sum(len(executor.run_queue) for executor in self.executors)
+
+    def __iter__(self):
+        """Iterate over the waiting task batches in no particular order."""
+        for executor in self.executors:
+            yield from executor.run_queue
+
+    def empty(self):
+        """Return True if no task batch is waiting."""
+        for executor in self.executors:
+            if not executor.run_queue.empty():
+                return False
+        return True
+
+    def enqueue(self, task_set):
+        """Add the task batches of a frame."""
+        assigned = [[] for executor in self.executors]
+        for task_batch in task_set:
+            executor = min(self.executors, key=lambda executor: executor.queued_time)
+            executor.queued_time = executor.queued_time + task_batch.remain_time
+            assigned[executor.executor_id].append(task_batch)
+
+        for executor in self.executors:
+            if assigned[executor.executor_id]:
+                executor.run_queue.put_all(assigned[executor.executor_id])
+
+    def remove(self, task_batch):
+        """Remove a waiting task batch. Return True if it was waiting."""
+        for executor in self.executors:
+            if executor.run_queue.remove(task_batch):
+                executor.queued_time = executor.queued_time - task_batch.remain_time
+                return True
+        return False
+
+    def take(self, executor):
+        """Remove and return the top entry of the executor's run queue."""
+        entry = executor.run_queue.get_entry()
+        executor.queued_time = executor.queued_time - entry[2].remain_time
+        return entry
+
+    def dispatch(self, preempt):
+        """Assign waiting task batches to the executors.
+
+        Args:
+            preempt: whether task batches in flight can be preempted.
+        """
+        for executor in self.executors:
+            if executor.task_batch is None:
+                victim = executor
+                if executor.run_queue.empty():
+                    victim = max(self.executors, key=lambda other: len(other.run_queue))
+                if not victim.run_queue.empty():
+                    executor.start(self.take(victim))
+
+            elif preempt and not executor.run_queue.empty():
+                # the key of a task batch in flight can change while it runs
+                executor.entry[0] = self.key(executor.task_batch)
+                if executor.run_queue.peek_entry() < executor.entry:
+                    entry = executor.stop()
+                    executor.start(self.take(executor))
+                    executor.run_queue.put_entry(entry)
+                    executor.queued_time = executor.queued_time + entry[2].remain_time
+
+
+DISPATCHERS = {
+    "global": GlobalDispatcher,
+    "work_stealing": WorkStealingDispatcher,
+}
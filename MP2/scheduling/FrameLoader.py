@@ -0,0 +1,71 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+
+
+class FrameLoader:
+    """Decode upcoming frames in background threads.
+
+    The scheduler calls advance() with the frame number its simulated clock has
+    reached. The loader then keeps the next prefetch_depth frames decoding or
+    decoded in a small thread pool and drops older frames, so at most
+    prefetch_depth decoded frames are held at a time.
+
+    Nothing is decoded until the first get(), i.e. until process_frame first
+    reads the pixels of an Image, so runs that never look at pixels do not
+    decode any frame.
+
+    Attributes:
+        image_list: path of each frame.
+        prefetch_depth: number of frames decoded ahead, including the current one.
+        read_frame: function decoding the frame at a path. Default is cv2.imread.
+        pool: the thread pool decoding frames.
+        futures: the decoded frames in the prefetch window, by frame number.
+        current: the frame number given to the last advance().
+        active: whether a frame has been read, which starts the prefetching.
+    """
+    def __init__(self, image_list, prefetch_depth = 4, workers = 2, read_frame = cv2.imread):
+        self.image_list = image_list
+        self.prefetch_depth = prefetch_depth
+        self.read_frame = read_frame
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.futures = OrderedDict()
+        self.current = 0
+        self.active = False
+
+    def advance(self, frame_number):
+        """Move the prefetch window to start at frame_number."""
+        self.current = frame_number
+        while self.futures:
+            oldest = next(iter(self.futures))
+            if oldest >= frame_number:
+                break
+            self.futures.pop(oldest).cancel()
+
+        if not self.active:
+            return
+        end = min(frame_number + self.prefetch_depth, len(self.image_list))
+        for n in range(frame_number, end):
+            if n not in self.futures:
+                self.futures[n] = self.pool.submit(self.read_frame, self.image_list[n])
+
+    def get(self, frame_number):
+        """Return the decoded frame, waiting for it if it is still being decoded.
+
+        Frames outside the prefetch window are decoded synchronously. The first
+        call starts prefetching from the current frame.
+        """
+        if not self.active:
+            self.active = True
+            self.advance(self.current)
+        future = self.futures.get(frame_number)
+        if future is None:
+            return self.read_frame(self.image_list[frame_number])
+        return future.result()
+
+    def close(self):
+        """Drop the prefetched frames and stop the threads."""
+        for future in self.futures.values():
+            future.cancel()
+        self.futures.clear()
+        self.pool.shutdown(wait=True)
@@ -0,0 +1,153 @@
+"""Pre-decoded, memory-mapped store of the frames of an image directory.
+
+Pack the png frames once from the MP2 directory with
+
+    python -m scheduling.FrameStore ../dataset/
+
+and pass frame_store = True to Scheduler to read frames from the store instead
+of decoding the png files.
+"""
+import json
+import os
+import sys
+import cv2
+import numpy as np
+from scheduling.misc import extract_png_files
+
+
+DATA_FILE = "frames.u8"
+MANIFEST_FILE = "frames.manifest.json"
+# frames start on page boundaries, so each frame maps to whole pages
+ALIGNMENT = 4096
+
+
+def store_paths(image_directory):
+    """Return the paths of the frame data and manifest of an image directory."""
+    return os.path.join(image_directory, DATA_FILE), os.path.join(image_directory, MANIFEST_FILE)
+
+
+def pack_frames(image_directory, read_frame = cv2.imread):
+    """Decode the png frames of a directory once into a single uint8 file.
+
+    The frames are written one after the other, in extract_png_files() order,
+    each aligned on ALIGNMENT bytes. The manifest records the name, shape and
+    byte offset of every frame.
+
+    Returns:
+        The number of frames packed.
+    """
+    data_path, manifest_path = store_paths(image_directory)
+    names, shapes, offsets = [], [], []
+    offset = 0
+    with open(data_path, 'wb') as data_file:
+        for path in extract_png_files(image_directory):
+            frame = read_frame(path)
+            if frame is None:
+                raise ValueError("cannot decode " + path)
+            padding = -offset % ALIGNMENT
+            data_file.write(b"\0" * padding)
+            offset = offset + padding
+
+            names.append(os.path.basename(path))
+            shapes.append(list(frame.shape))
+            offsets.append(offset)
+            data_file.write(np.ascontiguousarray(frame, dtype=np.uint8).data)
+            offset = offset + frame.nbytes
+
+    with open(manifest_path, 'w') as outfile:
+        json.dump({"data": DATA_FILE, "dtype": "uint8", "names": names,
+                   "shapes": shapes, "offsets": offsets}, outfile)
+    return len(names)
+
+
+class FrameStore:
+    """Read-only access to frames packed by pack_frames().
+
+    The data file is memory-mapped, so a frame is read from the page cache on
+    first access instead of being decoded, and get() returns a read-only
+    zero-copy view of it. Copy a frame before drawing on it.
+
+    Attributes:
+        directory: the image directory of the store.
+        data: the memory-mapped frame data.
+        names: frame names, in store order.
+        shapes: shape of each frame.
+        offsets: byte offset of each frame in data.
+        index: position of each frame name.
+    """
+    def __init__(self, image_directory):
+        data_path, manifest_path = store_paths(image_directory)
+        with open(manifest_path) as manifest_file:
+            manifest = json.load(manifest_file)
+        self.directory = image_directory
+        self.data = np.memmap(data_path, dtype=np.uint8, mode='r')
+        self.names = manifest["names"]
+        self.shapes = [tuple(shape) for shape in manifest["shapes"]]
+        self.offsets = manifest["offsets"]
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __getstate__(self):
+        # pickled by directory, the frames are mapped again when unpickled
+        return {"directory": self.directory}
+
+    def __setstate__(self, state):
+        self.__init__(state["directory"])
+
+    def get(self, name):
+        """Return a view of the frame with the given file name."""
+        i = self.index[name]
+        shape = self.shapes[i]
+        size = int(np.prod(shape))
+        return self.data[self.offsets[i]:self.offsets[i] + size].reshape(shape)
+
+    def read_frame(self, path):
+        """Return the frame at path from the store, or decode it if it is not stored.
+
+        It can be used in place of cv2.imread, e.g. as read_frame of a FrameLoader.
+        """
+        name = os.path.basename(path)
+        if name in self.index:
+            return self.get(name)
+        return cv2.imread(path)
+
+
+def load_frame_store(image_directory):
+    """Return the FrameStore of a directory, or None if it is missing or stale.
+
+    The store is stale if a png frame is more recent than its manifest.
+    """
+    data_path, manifest_path = store_paths(image_directory)
+    if not os.path.exists(manifest_path) or not os.path.exists(data_path):
+        return None
+    packed = os.path.getmtime(manifest_path)
+    for path in extract_png_files(image_directory):
+        if os.path.getmtime(path) > packed:
+            return None
+    return FrameStore(image_directory)
+
+
+opened_stores = {}
+
+
+def open_frame_store(image_directory):
+    """Return a FrameStore of the directory, opened once per process."""
+    if image_directory not in opened_stores:
+        opened_stores[image_directory] = FrameStore(image_directory)
+    return opened_stores[image_directory]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("usage: python -m scheduling.FrameStore image_directory [image_directory ...]")
+    for directory in sys.argv[1:]:
+        count = pack_frames(directory)
+        print("{:s}: {:d} frames packed".format(directory, count))
@@ -0,0 +1,141 @@
+import numpy as np
+
+
+HISTORY_DTYPE = np.dtype([
+    ("order", np.int32),
+    ("frame_id", np.int32),
+    ("coord", np.int32, (4,)),
+    ("img_width", np.int32),
+    ("img_height", np.int32),
+    ("depth", np.float64),
+    ("priority", np.float64),
+    ("priority_is_int", np.bool_),
+    ("bbox_id", np.int32),
+    ("enqueue_time", np.int64),
+    ("exec_time", np.int32),
+    ("response_time", np.int64),
+    ("deadline", np.int32),
+    ("missed", np.uint8),
+])
+
+
+class HistoryStore:
+    """Columnar scheduling history backed by a NumPy structured array.
+
+    Each finished task is stored as one row of fixed size instead of keeping the
+    TaskEntity alive. Image paths are interned into a frame table and referenced
+    by frame_id. The array doubles its capacity when full, so appending is
+    amortized O(1). Columns can be read directly with column() for vectorized
+    statistics, and to_dict() exports the same dictionary as save_history().
+
+    Tasks without coordinates (full frames) are stored with coord (-1, -1, -1, -1).
+
+    Attributes:
+        data: the structured array. Only the first size rows are used.
+        size: number of tasks stored.
+        frame_paths: image path of each frame_id.
+        frame_ids: frame_id of each image path.
+    """
+    def __init__(self, capacity = 1024):
+        self.data = np.zeros(capacity, dtype=HISTORY_DTYPE)
+        self.size = 0
+        self.frame_paths = []
+        self.frame_ids = {}
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        """Iterate over the entries as dictionaries, like the json history."""
+        for i in range(self.size):
+            yield self.entry(i)
+
+    def frame_id(self, image_path):
+        """Return the interned id of image_path."""
+        frame_id = self.frame_ids.get(image_path)
+        if frame_id is None:
+            frame_id = len(self.frame_paths)
+            self.frame_ids[image_path] = frame_id
+            self.frame_paths.append(image_path)
+        return frame_id
+
+    def append(self, task):
+        """Store a finished task."""
+        if self.size == len(self.data):
+            grown = np.zeros(2 * len(self.data), dtype=HISTORY_DTYPE)
+            grown[:self.size] = self.data
+            self.data = grown
+
+        coord = task.coord if task.coord else (-1, -1, -1, -1)
+        self.data[self.size] = (task.order, self.frame_id(task.image_path), coord,
+                                task.img_width, task.img_height, task.depth,
+                                task.priority, isinstance(task.priority, int), task.bbox_id,
+                                task.enqueue_time, task.exec_time, task.response_time,
+                                task.deadline, task.missed)
+        self.size = self.size + 1
+
+    def column(self, name):
+        """Return a view of a column for the stored tasks."""
+        return self.data[name][:self.size]
+
+    def image_paths(self):
+        """Return the image path of every stored task."""
+        return [self.frame_paths[frame_id] for frame_id in self.column("frame_id")]
+
+    def entry(self, i):
+        """Return the i-th stored task as a dictionary, like TaskEntity.__dict__."""
+        row = self.data[i]
+        image_path = self.frame_paths[row["frame_id"]]
+        j = image_path.rfind('/')
+        coord = row["coord"].tolist()
+        priority = row["priority"].item()
+        return {
+            "image_path": image_path,
+            "coord": coord if coord[0] >= 0 else 0,
+            "priority": int(priority) if row["priority_is_int"] else priority,
+            "depth": row["depth"].item(),
+            "bbox_id": row["bbox_id"].item(),
+            "image_out_path": image_path[:j+1] + "out/" + image_path[j+1:],
+            "order": row["order"].item(),
+            "exec_time": row["exec_time"].item(),
+            "remain_time": 0,
+            "enqueue_time": row["enqueue_time"].item(),
+            "response_time": row["response_time"].item(),
+            "missed": row["missed"].item(),
+            "img_width": row["img_width"].item(),
+            "img_height": row["img_height"].item(),
+            "deadline": row["deadline"].item(),
+        }
+
+    def to_dict(self):
+        """Return the history as the dictionary written to scheduling_history.json."""
+        d = {}
+        for i in range(self.size):
+            d[i + 1] = self.entry(i)
+        return d
+
+    def group_ids(self):
+        """Return the 10m depth group of every stored task, 100m and more in the last one."""
+        return np.minimum((self.column("depth") / 10).astype(np.int64), 9)
+
+    def group_avg_response_time(self):
+        """Vectorized get_group_avg_response_time() over the stored tasks."""
+        group_id = self.group_ids()
+        length = max(10, int(group_id.max()) + 1) if self.size else 10
+        total = np.bincount(group_id, weights=self.column("response_time"), minlength=length)
+        count = np.bincount(group_id, minlength=length)
+        result = []
+        for i in range(10):
+            if count[i] != 0:
+                result.append(float("{:.3f}".format(total[i] / count[i])))
+            else:
+                result.append(0)
+        return result
+
+    def group_worst_response_time(self):
+        """Vectorized get_group_worst_response_time() over the stored tasks."""
+        group_id = self.group_ids()
+        length = max(10, int(group_id.max()) + 1) if self.size else 10
+        worst = np.zeros(length, dtype=np.int64)
+        np.maximum.at(worst, group_id, self.column("response_time"))
+        return worst[:10].tolist()
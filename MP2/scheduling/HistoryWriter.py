@@ -0,0 +1,67 @@
+import json
+import os
+
+
+class JsonlHistoryWriter:
+    """Stream the scheduling history to a JSON lines file.
+
+    Each finished task is written as one compact json object per line as soon as
+    it finishes, so the history does not have to be kept in memory. The file can
+    be read back with read_history_jsonl() in misc.py. write() streams any
+    other json record the same way, e.g. the scheduled boxes of a checkpointed
+    run.
+
+    A pickled writer records the length of the file written so far. Unpickling
+    it truncates the file to that length and appends from there, so a scheduler
+    resumed from a checkpoint writes the same file as an uninterrupted run.
+
+    Attributes:
+        path: the path of the JSON lines file.
+        buffer_size: size of the write buffer in bytes.
+        outfile: the file being written.
+        count: number of tasks written so far.
+    """
+    def __init__(self, path, buffer_size = 1 << 16):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.outfile = open(path, 'w', buffering=buffer_size)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __getstate__(self):
+        if not self.outfile.closed:
+            self.outfile.flush()
+            offset = self.outfile.tell()
+        else:
+            offset = os.path.getsize(self.path)
+        return {"path": self.path, "buffer_size": self.buffer_size, "count": self.count,
+                "offset": offset}
+
+    def __setstate__(self, state):
+        self.path = state["path"]
+        self.buffer_size = state["buffer_size"]
+        self.count = state["count"]
+        self.outfile = open(self.path, 'r+', buffering=self.buffer_size)
+        self.outfile.truncate(state["offset"])
+        self.outfile.seek(state["offset"])
+
+    def append(self, task):
+        """Write a finished task."""
+        self.write(task.__dict__)
+
+    def write(self, entry):
+        """Write a json record as one line."""
+        self.outfile.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':')))
+        self.outfile.write('\n')
+        self.count = self.count + 1
+
+    def flush(self):
+        """Write the buffered tasks to the file, so it can be read back."""
+        if not self.outfile.closed:
+            self.outfile.flush()
+
+    def close(self):
+        """Flush and close the file."""
+        self.outfile.close()
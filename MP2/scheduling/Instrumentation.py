@@ -0,0 +1,176 @@
+import json
+import time
+import tracemalloc
+from collections import Counter
+
+
+class PhaseTimer:
+    """Wall-clock time spent in one phase.
+
+    Attributes:
+        calls: number of times the phase ran.
+        seconds: total time spent in the phase.
+        max_seconds: longest single call.
+    """
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+
+    def add(self, seconds):
+        """Record one call that took the given time."""
+        self.calls = self.calls + 1
+        self.seconds = self.seconds + seconds
+        if seconds > self.max_seconds:
+            self.max_seconds = seconds
+
+    def report(self):
+        return {"calls": self.calls, "seconds": self.seconds, "max_seconds": self.max_seconds,
+                "mean_seconds": self.seconds / self.calls if self.calls else 0.0}
+
+
+class Instrumentation:
+    """Profile the hot path of a Scheduler.
+
+    attach() replaces the instrumented methods of one scheduler with timed
+    wrappers, so a scheduler built without instrumentation runs exactly the
+    same code as before and pays nothing. Timers are inclusive: frame_arrival
+    includes process_frame and enqueue_task.
+
+    Attributes:
+        timers: a PhaseTimer per phase.
+        counters: named event counts.
+        histograms: named Counters of observed values. "queue_depth" is the number
+                of waiting task batches after each enqueue_task and dispatch,
+                "batch_size" the size of each enqueued task batch.
+        trace_memory: whether tracemalloc snapshots are taken.
+        memory_top: number of allocation sites kept in each memory snapshot.
+        memory: the memory snapshots, in order.
+        started_tracing: whether start() started tracemalloc.
+        run_start: perf_counter() value at the last start().
+        wrapped: (owner, name, previous) of each wrapped method, where previous is
+                the instance attribute it replaced, or None, so detach() can
+                restore it.
+    """
+    PHASES = ["frame_arrival", "process_frame", "enqueue_task", "finish_task_batch"]
+
+    def __init__(self, trace_memory = False, memory_top = 10):
+        self.timers = {}
+        self.counters = Counter()
+        self.histograms = {"queue_depth": Counter(), "batch_size": Counter()}
+        self.trace_memory = trace_memory
+        self.memory_top = memory_top
+        self.memory = []
+        self.started_tracing = False
+        self.run_start = 0.0
+        self.wrapped = []
+
+    def timer(self, phase):
+        """Return the PhaseTimer of a phase, creating it if needed."""
+        if phase not in self.timers:
+            self.timers[phase] = PhaseTimer()
+        return self.timers[phase]
+
+    def wrap(self, owner, name, phase = None, after = None):
+        """Replace the method owner.name by a timed wrapper.
+
+        Args:
+            owner: the object whose method is wrapped.
+            name: the method name.
+            phase: the timer name. Default is name.
+            after: a function called with the arguments of each call once it returns.
+        """
+        function = getattr(owner, name)
+        self.wrapped.append((owner, name, owner.__dict__.get(name)))
+        timer = self.timer(phase or name)
+        clock = time.perf_counter
+
+        def timed(*args, **kwargs):
+            start = clock()
+            result = function(*args, **kwargs)
+            timer.add(clock() - start)
+            if after is not None:
+                after(*args, **kwargs)
+            return result
+
+        setattr(owner, name, timed)
+
+    def attach(self, scheduler):
+        """Instrument the hot path of a scheduler."""
+        dispatcher = scheduler.dispatcher
+        queue_depth = self.histograms["queue_depth"]
+        batch_size = self.histograms["batch_size"]
+        counters = self.counters
+
+        def enqueued(task_set):
+            counters["task_batches_enqueued"] += len(task_set)
+            for task_batch in task_set:
+                batch_size[task_batch.batch_size] += 1
+                counters["tasks_enqueued"] += task_batch.batch_size
+            queue_depth[len(dispatcher)] += 1
+
+        def dispatched(preempt):
+            if preempt:
+                counters["preemption_points"] += 1
+            queue_depth[len(dispatcher)] += 1
+
+        for phase in self.PHASES:
+            if phase == "enqueue_task":
+                self.wrap(scheduler, phase, after = enqueued)
+            else:
+                self.wrap(scheduler, phase)
+        self.wrap(dispatcher, "dispatch", after = dispatched)
+
+    def detach(self):
+        """Remove the wrappers installed by attach(), keeping the measurements."""
+        for owner, name, previous in reversed(self.wrapped):
+            if previous is None:
+                delattr(owner, name)
+            else:
+                setattr(owner, name, previous)
+        self.wrapped = []
+
+    def start(self):
+        """Start a run, and tracemalloc if memory is traced."""
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        self.snapshot("start")
+        self.run_start = time.perf_counter()
+
+    def stop(self):
+        """End a run, and tracemalloc if start() started it."""
+        self.timer("run").add(time.perf_counter() - self.run_start)
+        self.snapshot("end")
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def snapshot(self, label):
+        """Record the traced memory and its top allocation sites."""
+        if not self.trace_memory or not tracemalloc.is_tracing():
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        statistics = tracemalloc.take_snapshot().statistics("lineno")[:self.memory_top]
+        self.memory.append({
+            "label": label,
+            "current_bytes": current,
+            "peak_bytes": peak,
+            "top": [{"site": str(stat.traceback), "bytes": stat.size, "blocks": stat.count}
+                    for stat in statistics],
+        })
+
+    def report(self):
+        """Return the collected measurements as a json serializable dictionary."""
+        return {
+            "timers": {phase: timer.report() for phase, timer in self.timers.items()},
+            "counters": dict(self.counters),
+            "histograms": {name: {str(value): count for value, count in sorted(histogram.items())}
+                           for name, histogram in self.histograms.items()},
+            "memory": self.memory,
+        }
+
+    def save(self, path):
+        """Write report() to a json file."""
+        with open(path, 'w') as outfile:
+            json.dump(self.report(), outfile, ensure_ascii=False, indent=4)
@@ -0,0 +1,41 @@
+from scheduling.RunQueue import priority_key
+
+
+def deadline_key(task_batch):
+    """Sort key for earliest-deadline-first: absolute deadline, then priority."""
+    return (task_batch.enqueue_time + task_batch.deadline, task_batch.priority)
+
+
+def slack_key(task_batch):
+    """Sort key for least-slack-first: slack at time 0, then priority.
+
+    The slack of a waiting task batch at time t is
+    enqueue_time + deadline - t - remain_time. All task batches are compared at
+    the same t, so it is left out and the key only changes while the task batch
+    runs, i.e. when its remain_time decreases.
+    """
+    return (task_batch.enqueue_time + task_batch.deadline - task_batch.remain_time,
+            task_batch.priority)
+
+
+class SchedulingPolicy:
+    """How the scheduler orders task batches and whether it preempts them.
+
+    Attributes:
+        key: function returning the sort key of a task batch.
+                A lower key is scheduled first.
+        preemptive: whether a task batch in flight is preempted when a task batch
+                with a lower key arrives. Preemption only happens at frame arrivals.
+    """
+    def __init__(self, key, preemptive):
+        self.key = key
+        self.preemptive = preemptive
+
+
+POLICIES = {
+    # the run queue top is preempted by higher priority task batches of a new frame
+    "fixed_priority": SchedulingPolicy(priority_key, preemptive = True),
+    "fixed_priority_np": SchedulingPolicy(priority_key, preemptive = False),
+    "edf": SchedulingPolicy(deadline_key, preemptive = True),
+    "lsf": SchedulingPolicy(slack_key, preemptive = True),
+}
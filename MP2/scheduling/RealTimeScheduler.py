@@ -0,0 +1,119 @@
+import asyncio
+from scheduling.Scheduler import Scheduler
+from scheduling.HistoryStore import HistoryStore
+
+
+class RealTimeScheduler(Scheduler):
+    """Scheduler running in wall-clock time on an asyncio event loop.
+
+    Frames are released every frame_period time units of real time, and each
+    executor is a coroutine that runs its task batch for real: either by calling
+    work(task_batch) in a worker thread, or by sleeping for the modeled
+    execution time. Task batches are not preempted.
+
+    All times are recorded in time units of time_unit_ms milliseconds since the
+    start of the run, in the same history fields as the simulation: enqueue_time
+    is when the frame was released, exec_time the measured run time and
+    response_time the time from enqueue to finish. The start time of a task is
+    enqueue_time + response_time - exec_time. A task missed its deadline if
+    response_time > deadline, so the miss rate can be compared with a simulation
+    using the same parameters.
+
+    Attributes:
+        time_unit_ms: length of one time unit in milliseconds. Default is 1, so
+                frame_period and deadlines are in milliseconds.
+        work: function running a task batch, or None to sleep for the modeled
+                execution time.
+        start_clock: event loop time at the start of the run, in seconds.
+        released_all: whether all frames have been released.
+        condition: asyncio condition the executors wait on for new task batches.
+    """
+    def __init__(self, *args, time_unit_ms = 1.0, work = None, **kwargs):
+        if kwargs.get("checkpoint_file"):
+            raise ValueError("RealTimeScheduler does not support checkpoints")
+        super().__init__(*args, **kwargs)
+        if self.batch_former is not None:
+            raise ValueError("RealTimeScheduler does not support a batch former")
+        if isinstance(self.history, HistoryStore):
+            # its integer time columns would truncate the wall-clock times
+            raise ValueError("RealTimeScheduler does not support columnar_history")
+        self.time_unit_ms = time_unit_ms
+        self.work = work
+        self.start_clock = 0
+        self.released_all = False
+        self.condition = None
+
+    def simulate(self):
+        """Run the scheduler in real time until all frames are processed."""
+        asyncio.run(self.run_async())
+
+    def now(self):
+        """Return the time units elapsed since the start of the run."""
+        elapsed_ms = (asyncio.get_running_loop().time() - self.start_clock) * 1000
+        return round(elapsed_ms / self.time_unit_ms, 3)
+
+    async def run_async(self):
+        """Release frames and run the executors concurrently."""
+        self.start_clock = asyncio.get_running_loop().time()
+        self.released_all = False
+        self.condition = asyncio.Condition()
+
+        workers = [asyncio.create_task(self.run_executor(executor)) for executor in self.executors]
+        await self.release_frames()
+        await asyncio.gather(*workers)
+        self.time = self.now()
+
+    async def release_frames(self):
+        """Release a frame every frame_period time units."""
+        period = self.frame_period * self.time_unit_ms / 1000
+        for frame_number in range(self.max_frame_number):
+            delay = self.start_clock + frame_number * period - asyncio.get_running_loop().time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            self.time = self.now()
+            self.frame_arrival(frame_number)
+            self.frame_number = frame_number + 1
+            async with self.condition:
+                self.condition.notify_all()
+
+        async with self.condition:
+            self.released_all = True
+            self.condition.notify_all()
+
+    async def run_executor(self, executor):
+        """Run task batches on one executor until all the work is done."""
+        while True:
+            async with self.condition:
+                await self.condition.wait_for(
+                    lambda: executor.task_batch is not None or not self.dispatcher.empty()
+                    or self.released_all)
+                if executor.task_batch is None:
+                    if self.admission is not None:
+                        self.time = self.now()
+                        self.expire_task_batches()
+                    self.dispatcher.dispatch(preempt = False)
+                    # other idle executors may have been given a task batch too
+                    self.condition.notify_all()
+                if executor.task_batch is None:
+                    if self.released_all and self.dispatcher.empty():
+                        return
+                    continue
+
+            task_batch = executor.task_batch
+            start = self.now()
+            if self.work is not None:
+                await asyncio.get_running_loop().run_in_executor(None, self.work, task_batch)
+            else:
+                await asyncio.sleep(task_batch.remain_time * self.time_unit_ms / 1000)
+            finish = self.now()
+
+            executor.busy_time = executor.busy_time + finish - start
+            task_batch.remain_time = 0
+            task_batch.set_exec_time(round(finish - start, 3))
+            self.time = finish
+            self.finish_task_batch(executor.finish())
+
+    def get_response_time(self, task):
+        """Return the response time of a task finishing at the current wall-clock time."""
+        return round(self.time - task.enqueue_time, 3)
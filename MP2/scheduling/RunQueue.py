@@ -0,0 +1,133 @@
+import heapq
+
+
+def priority_key(task_batch):
+    """Default sort key: priority first, then enqueue_time."""
+    return (task_batch.priority, task_batch.enqueue_time)
+
+
+class RunQueue:
+    """Heap-based run queue for the single-threaded scheduler.
+
+    Unlike queue.PriorityQueue this queue takes no locks. The sort key of every
+    task batch is computed once when it is inserted and stored in the heap entry
+    together with a sequence number, so the heap only compares plain tuples and
+    batches with the same key leave the queue in insertion order.
+
+    Removed batches are only marked as removed and are discarded once they reach
+    the top of the heap, or when they make up more than half of the heap.
+
+    Attributes:
+        key: function returning the sort key of a task batch.
+                A lower key means higher priority.
+        heap: list of [key, sequence number, task_batch] entries.
+        entries: the heap entry of each queued task batch, by id().
+        counter: sequence number given to the next inserted task batch.
+        removed: number of removed entries still in the heap.
+    """
+    def __init__(self, key = priority_key):
+        self.key = key
+        self.heap = []
+        self.entries = {}
+        self.counter = 0
+        self.removed = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __setstate__(self, state):
+        # entries are keyed by id(), which changes when the queue is unpickled
+        self.__dict__.update(state)
+        self.entries = {id(entry[2]): entry for entry in self.heap if entry[2] is not None}
+
+    def __iter__(self):
+        """Iterate over the queued task batches in no particular order."""
+        for entry in self.heap:
+            if entry[2] is not None:
+                yield entry[2]
+
+    def empty(self):
+        """Return True if the queue holds no task batch."""
+        return not self.entries
+
+    def make_entry(self, task_batch):
+        """Return a new heap entry for task_batch and register it."""
+        entry = [self.key(task_batch), self.counter, task_batch]
+        self.counter = self.counter + 1
+        self.entries[id(task_batch)] = entry
+        return entry
+
+    def put(self, task_batch):
+        """Insert a single task batch."""
+        heapq.heappush(self.heap, self.make_entry(task_batch))
+
+    def put_all(self, task_set):
+        """Insert a list of task batches, e.g. the task_set of a frame.
+
+        Large insertions are appended and heapified at once, which is linear
+        in the size of the heap instead of a push per task batch.
+        """
+        new_entries = [self.make_entry(task_batch) for task_batch in task_set]
+        if len(new_entries) >= len(self.heap):
+            self.heap.extend(new_entries)
+            heapq.heapify(self.heap)
+        else:
+            for entry in new_entries:
+                heapq.heappush(self.heap, entry)
+
+    def peek(self):
+        """Return the top task batch without removing it, or None if empty."""
+        if self.heap:
+            return self.heap[0][2]
+        return None
+
+    def peek_entry(self):
+        """Return the heap entry of the top task batch, or None if empty."""
+        if self.heap:
+            return self.heap[0]
+        return None
+
+    def get(self):
+        """Remove and return the top task batch."""
+        return self.get_entry()[2]
+
+    def get_entry(self):
+        """Remove the top task batch and return its heap entry.
+
+        The entry can be given back to put_entry() to requeue the task batch
+        at the position it had before, e.g. when it is preempted.
+        """
+        entry = heapq.heappop(self.heap)
+        del self.entries[id(entry[2])]
+        self.discard_removed()
+        return entry
+
+    def put_entry(self, entry):
+        """Requeue a heap entry returned by get_entry()."""
+        self.entries[id(entry[2])] = entry
+        heapq.heappush(self.heap, entry)
+
+    def remove(self, task_batch):
+        """Remove the given task batch from the queue.
+
+        Returns:
+            True if the task batch was queued, False otherwise.
+        """
+        entry = self.entries.pop(id(task_batch), None)
+        if entry is None:
+            return False
+        entry[2] = None
+        self.removed = self.removed + 1
+        if self.removed * 2 > len(self.heap):
+            self.heap = [entry for entry in self.heap if entry[2] is not None]
+            heapq.heapify(self.heap)
+            self.removed = 0
+        else:
+            self.discard_removed()
+        return True
+
+    def discard_removed(self):
+        """Pop removed entries from the top so that heap[0] is always queued."""
+        while self.heap and self.heap[0][2] is None:
+            heapq.heappop(self.heap)
+            self.removed = self.removed - 1
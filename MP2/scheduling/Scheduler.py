@@ -1,6 +1,20 @@
-from queue import PriorityQueue
+import importlib
+import math
+import pickle
 from scheduling.misc import *
-from process_frame import *
+from scheduling.TaskEntity import *
+from scheduling.Executor import Executor, DISPATCHERS
+from scheduling.Policy import POLICIES
+from scheduling.HistoryWriter import JsonlHistoryWriter
+from scheduling.HistoryStore import HistoryStore
+from scheduling.render import render_history
+from scheduling.FrameLoader import FrameLoader
+from scheduling.FrameStore import FrameStore, load_frame_store
+from scheduling.Instrumentation import Instrumentation
+from scheduling.CostModel import get_cost_model
+from scheduling.AdmissionControl import AdmissionControl
+from scheduling.Evaluator import OnlineEvaluator
+from scheduling.SchedulerResult import SchedulerResult
 
 
 class Scheduler:
@@ -13,37 +27,241 @@ class Scheduler:
         time: the simulated timer.
         frame_period: The period to obtain a new frame. 
         image_directory: The path to the image directory. Default is "../dataset/".
-        image_list: a list containing all the images to be processed. 
+        image_list: a list containing all the images to be processed. Default is
+                the png files in image_directory.
         max_frame_number: the number of frame to be processed. 
-        run_queue: a priority queue that sorts task by their priority.
-                A lower number means higher priority. 
-        history: scheduling history. 
+        frame_store: a FrameStore the frames are read from instead of decoding the
+                png files, or None (default). frame_store = True uses the store
+                packed in image_directory, if it is up to date.
+        prefetch_depth: number of frames decoded ahead by frame_loader.
+        frame_loader: a FrameLoader decoding the next prefetch_depth frames in
+                background threads, or None if prefetch_depth is 0 (default).
+        policy: the scheduling policy. "fixed_priority" sorts by priority and preempts
+                at frame arrivals, "fixed_priority_np" never preempts, "edf" runs the
+                earliest absolute deadline first and "lsf" the least slack first.
+        executors: the simulated accelerators. Each runs one task batch at a time.
+        dispatcher: assigns task batches to the executors. "global" shares one run
+                queue between all executors, "work_stealing" gives each executor its
+                own run queue. The run queues sort task batches by the policy key.
+                A lower key means higher priority. Task batches with the same key
+                run in the order they were enqueued.
+        history: scheduling history. A list of finished tasks, a JsonlHistoryWriter
+                streaming them to history_file, or a HistoryStore if columnar_history
+                is set.
+        history_file: path of a JSON lines file the finished tasks are written to as
+                they finish, instead of keeping them in memory. Default is None,
+                or checkpoint_file + ".history.jsonl" if checkpoint_file is set.
         task_finish_count: number of tasks that have finished. 
         task_batch_finish_count: number of task batches that have finished. 
         task_missed_count: number of tasks that missed deadline.
         scheduled_boxes: cluster boxes scheduled
+        box_log: a JsonlHistoryWriter streaming the scheduled cluster boxes of each
+                frame to checkpoint_file + ".boxes.jsonl" if checkpoint_file is set,
+                or None. scheduled_boxes is then read back from it at the end of run().
+        evaluator: an OnlineEvaluator updating coverage and accuracy as cluster boxes
+                are scheduled, or None (default). Ground truth can be given instead,
+                as a dictionary, a BoxStore or the path of its json file. Only
+                ground truth given by path is left out of checkpoints. If
+                checkpoint_file is set, the frame results are streamed to
+                checkpoint_file + ".evaluation.jsonl".
+        process_frame: the function turning a frame into a task_set. It can be given
+                as the name of a module defining process_frame(), such as
+                "process_frame_p4". Default is the "process_frame" module.
+        exec_time_model: the cost model returning the execution time of a task batch.
+                A function of the task batch, such as a CostModel, a name in
+                COST_MODELS or the path of a TableCostModel json file. Default is
+                None, the LinearCostModel formula in get_execution_time().
+        event_driven: whether run() jumps from event to event instead of
+                advancing the timer one unit at a time.
+        admission: an AdmissionControl rejecting task batches that cannot meet their
+                deadline at enqueue time and expiring queued ones that become
+                hopeless, or None if admission_control is not set (default).
+        dropped: tasks rejected or expired by admission control, kept apart from
+                the history. A list, or a JsonlHistoryWriter streaming them to
+                checkpoint_file + ".dropped.jsonl" if checkpoint_file is set.
+        task_dropped_count: number of tasks dropped by admission control.
+        batch_former: a BatchFormer grouping same-shape task batches across frames
+                before they reach the run queue, or None (default).
+        next_frame: the task batches of the last frame as if they arrived again
+                with the next frame, with their execution time. response_time()
+                expects them. Only kept with a batch_former.
+        response_histogram: a ResponseTimeHistogram updated as tasks finish, or None
+                (default). See analytics.py.
+        instrumentation: an Instrumentation timing the hot path of run(), or None
+                (default). Passing instrument = True creates one.
+        checkpoint_file: path the scheduler state is saved to every
+                checkpoint_interval time units of the run, or None (default).
+                Scheduler.resume() loads it and run() then continues the run,
+                with the same result as a run that was never interrupted. The
+                history, scheduled boxes and dropped tasks are then streamed to
+                files next to it, so a checkpoint only grows with the pending work.
+                columnar_history cannot be used with checkpoints.
+        checkpoint_interval: simulated time between two checkpoints.
+        next_checkpoint: simulated time of the next checkpoint.
     """
 
-    def __init__(self, image_directory = "../dataset/", num_frames = 0, frame_period = 100):
+    def __init__(self, image_directory = "../dataset/", num_frames = 0, frame_period = 100,
+                event_driven = False, num_executors = 1, dispatch = "global",
+                policy = "fixed_priority", process_frame = "process_frame", exec_time_model = None,
+                history_file = None, columnar_history = False, prefetch_depth = 0,
+                image_list = None, instrument = False, response_histogram = None,
+                batch_former = None, admission_control = False, frame_store = None,
+                evaluator = None, checkpoint_file = None, checkpoint_interval = 100000):
+        if checkpoint_file and columnar_history:
+            raise ValueError("checkpoints stream the history, columnar_history cannot be used")
+        if checkpoint_file and not history_file:
+            history_file = checkpoint_file + ".history.jsonl"
+
         self.time = 0
+        self.event_driven = event_driven
         self.frame_period = frame_period
         self.frame_number = 0
         self.image_directory = image_directory
-        self.image_list = extract_png_files(image_directory)
+        if image_list is None:
+            self.image_list = extract_png_files(image_directory)
+        else:
+            self.image_list = image_list
         if num_frames == 0:
             self.max_frame_number = len(self.image_list)
         else: 
             self.max_frame_number = num_frames
 
-        self.run_queue = PriorityQueue()
-        self.history = []
+        if frame_store is True:
+            frame_store = load_frame_store(image_directory)
+        elif isinstance(frame_store, str):
+            frame_store = FrameStore(frame_store)
+        self.frame_store = frame_store
+        self.prefetch_depth = prefetch_depth
+        self.frame_loader = self.make_frame_loader()
+
+        if isinstance(policy, str):
+            policy = POLICIES[policy]
+        self.policy = policy
+        self.executors = [Executor(i) for i in range(num_executors)]
+        if isinstance(dispatch, str):
+            dispatch = DISPATCHERS[dispatch]
+        self.dispatcher = dispatch(self.executors, policy.key)
+        if isinstance(process_frame, str):
+            process_frame = importlib.import_module(process_frame).process_frame
+        self.process_frame = process_frame
+        if exec_time_model is None:
+            exec_time_model = "linear"
+        self.exec_time_model = get_cost_model(exec_time_model)
+        self.history_file = history_file
+        if history_file:
+            self.history = JsonlHistoryWriter(history_file)
+        elif columnar_history:
+            self.history = HistoryStore()
+        else:
+            self.history = []
         self.scheduled_boxes = {}
+        if checkpoint_file:
+            self.box_log = JsonlHistoryWriter(checkpoint_file + ".boxes.jsonl")
+        else:
+            self.box_log = None
+        if evaluator is not None and not isinstance(evaluator, OnlineEvaluator):
+            if isinstance(evaluator, str):
+                evaluator = OnlineEvaluator(load_box_info(evaluator), evaluator)
+            else:
+                evaluator = OnlineEvaluator(evaluator)
+        if checkpoint_file and evaluator is not None and evaluator.log is None:
+            evaluator.log = JsonlHistoryWriter(checkpoint_file + ".evaluation.jsonl")
+        self.evaluator = evaluator
         self.task_finish_count = 0
         self.task_batch_finish_count = 0
         self.task_missed_count = 0
-
-
-    def run(self):
+        self.response_histogram = response_histogram
+        self.batch_former = batch_former
+        self.next_frame = []
+        if admission_control:
+            self.admission = AdmissionControl(self.dispatcher)
+        else:
+            self.admission = None
+        if checkpoint_file:
+            self.dropped = JsonlHistoryWriter(checkpoint_file + ".dropped.jsonl")
+        else:
+            self.dropped = []
+        self.task_dropped_count = 0
+        if batch_former is not None and batch_former.cost_model is None:
+            batch_former.cost_model = self.exec_time_model
+        if batch_former is not None and batch_former.response_time is None:
+            batch_former.response_time = self.response_time
+        if batch_former is not None and batch_former.frame_period is None:
+            batch_former.frame_period = frame_period
+
+        if instrument is True:
+            instrument = Instrumentation()
+        self.instrumentation = instrument or None
+        if self.instrumentation:
+            self.instrumentation.attach(self)
+
+        self.checkpoint_file = checkpoint_file
+        self.checkpoint_interval = checkpoint_interval
+        self.next_checkpoint = checkpoint_interval
+
+    def make_frame_loader(self):
+        """Return a FrameLoader for the frames to process, or None if prefetch_depth is 0."""
+        if self.prefetch_depth <= 0:
+            return None
+        read_frame = self.frame_store.read_frame if self.frame_store else cv2.imread
+        return FrameLoader(self.image_list[:self.max_frame_number], self.prefetch_depth,
+                           read_frame = read_frame)
+
+    def __getstate__(self):
+        # the frame loader threads are started again when the scheduler is unpickled
+        state = self.__dict__.copy()
+        state["frame_loader"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.frame_loader = self.make_frame_loader()
+        if self.instrumentation:
+            self.instrumentation.attach(self)
+
+    def save_checkpoint(self, path = None):
+        """Save the scheduler state to path, checkpoint_file by default.
+
+        The state is pickled between two iterations of the scheduling loop: the
+        timer, frame number, run queues with the remaining time of every task
+        batch, executors and counters. The history, scheduled boxes and dropped
+        tasks streamed next to checkpoint_file are saved as their length in
+        their file, and frame and box stores and ground truth given by path as
+        their path. The file is replaced atomically, so an interrupted save
+        leaves the previous checkpoint.
+
+        process_frame, exec_time_model and the other functions given to the
+        scheduler are pickled by name, so they must be defined at module level.
+        """
+        if path is None:
+            path = self.checkpoint_file
+        # the instrumentation wrappers are closures, which cannot be pickled
+        if self.instrumentation:
+            self.instrumentation.detach()
+        try:
+            with open(path + ".tmp", 'wb') as outfile:
+                pickle.dump(self, outfile, protocol=pickle.HIGHEST_PROTOCOL)
+        finally:
+            if self.instrumentation:
+                self.instrumentation.attach(self)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def resume(cls, path):
+        """Return the scheduler saved by save_checkpoint(). Call run() to continue it."""
+        with open(path, 'rb') as infile:
+            scheduler = pickle.load(infile)
+        if not isinstance(scheduler, cls):
+            raise TypeError(path + " is not a checkpoint of " + cls.__name__)
+        return scheduler
+
+    def checkpoint(self):
+        """Save a checkpoint if checkpoint_interval has elapsed since the last one."""
+        if self.time >= self.next_checkpoint:
+            self.next_checkpoint = (self.time // self.checkpoint_interval + 1) * self.checkpoint_interval
+            self.save_checkpoint()
+
+    def run(self, save = False, output_directory = "."):
         """Main scheduling loop.
 
         The scheduling loop finishes until all frames have been processed.
@@ -51,45 +269,212 @@ class Scheduler:
         be processed by student's code and return a list of tasks corresponding
         to different cluster boxes for that frame.
 
-        The scheduler always run the top task in the run queue.
+        Each executor runs the top task in the run queue it is dispatched from.
+
+        Args:
+            save: whether to save the scheduling history to files and print a
+                    summary. Default is False.
+            output_directory: the directory the files are saved to. Default is
+                    the current directory.
 
+        Returns:
+            A SchedulerResult with the history, scheduled boxes and counters.
         """
-        while self.frame_number <= self.max_frame_number or not self.run_queue.empty():
-            
-            # get a frame when frame period arrives
-            if self.time % self.frame_period == 0:
-                self.frame_arrival(self.frame_number)
-                self.frame_number = self.frame_number + 1
-
-            # if there are tasks in the run queue
-            if not self.run_queue.empty():
-                top_task_batch = self.run_queue.queue[0]
-                top_task_batch.remain_time = top_task_batch.remain_time - 1
-                # if the task has finished
-                if top_task_batch.remain_time == 0:
-                    task_batch = self.run_queue.get()
-                    self.task_batch_finish_count = self.task_batch_finish_count + 1
-                    self.task_finish_count = self.task_finish_count + task_batch.batch_size
-                    task_batch.set_task_order(self.task_batch_finish_count)
-                    task_batch.set_response_time(self.time - task_batch.enqueue_time + 1)
-                    for task in task_batch.tasks:
-                        if task.response_time > task.deadline:
-                            task.missed = 1
-                            self.task_missed_count = self.task_missed_count + 1
-
-                        self.history.append(task)
+        if self.instrumentation:
+            self.instrumentation.start()
+            self.simulate()
+            self.instrumentation.stop()
+        else:
+            self.simulate()
+
+        if self.history_file:
+            self.history.close()
+        if self.box_log is not None:
+            self.box_log.close()
+            self.scheduled_boxes = {}
+            for entry in read_history_jsonl(self.box_log.path):
+                self.scheduled_boxes.setdefault(entry["image"], []).extend(entry["boxes"])
+        if isinstance(self.dropped, JsonlHistoryWriter):
+            self.dropped.close()
+        if self.evaluator is not None and self.evaluator.log is not None:
+            self.evaluator.log.close()
+        if self.frame_loader:
+            self.frame_loader.close()
+
+        result = SchedulerResult(self)
+        if save:
+            # save scheduling history to file
+            self.save_history(output_directory)
+            print("Scheduling history saved.")
+            result.print_summary()
+        return result
+
+    def simulate(self):
+        """Run the scheduling loop selected by event_driven."""
+        if self.event_driven:
+            self.run_event_driven()
+        else:
+            self.run_tick()
+
+    def handle_events(self):
+        """Handle the events of the current time, before the executors run.
+
+        Both scheduling loops start every iteration with it: save a checkpoint
+        if one is due, expire hopeless task batches, get a frame when the frame
+        period arrives, release formed task batches and dispatch.
+        """
+        if self.checkpoint_file:
+            self.checkpoint()
+
+        # expire hopeless task batches before the run queue changes
+        if self.admission is not None:
+            self.expire_task_batches()
+
+        # get a frame when frame period arrives
+        arrived = False
+        if self.time % self.frame_period == 0:
+            arrived = self.frame_number < self.max_frame_number
+            self.frame_arrival(self.frame_number)
+            self.frame_number = self.frame_number + 1
+
+        if self.batch_former is not None:
+            self.release_formed_batches()
+
+        # task batches in flight can only be preempted when a frame arrives
+        self.dispatcher.dispatch(preempt = arrived and self.policy.preemptive)
+
+    def run_tick(self):
+        """Advance the simulated timer by one time unit per loop iteration."""
+        while self.frame_number <= self.max_frame_number or self.has_pending_work():
+
+            self.handle_events()
+
+            for executor in self.executors:
+                if executor.task_batch is not None:
+                    executor.run(1)
+                    # if the task has finished
+                    if executor.task_batch.remain_time == 0:
+                        self.finish_task_batch(executor.finish())
 
             self.time = self.time + 1
-        
-        # save scheduling history to file
-        self.save_history()
-        print("Scheduling history saved.")
-        print("deadline miss rate is: ", self.task_missed_count / self.task_finish_count)
+
+    def run_event_driven(self):
+        """Advance the simulated timer directly to the next event.
+
+        The only events that change the scheduler state are frame arrivals,
+        releases of the batch former, expiries of admission control and task
+        batch completions, so the ticks in between are skipped. The resulting
+        history is identical to run_tick().
+        """
+        while self.frame_number <= self.max_frame_number or self.has_pending_work():
+
+            self.handle_events()
+
+            # time of the next frame arrival, if any frame is still expected
+            if self.frame_number <= self.max_frame_number:
+                next_arrival = (self.time // self.frame_period + 1) * self.frame_period
+            else:
+                next_arrival = None
+
+            # a release of formed task batches is an event too
+            if self.batch_former is not None and not self.batch_former.empty():
+                next_release = max(self.batch_former.next_release(), self.time + 1)
+                if next_arrival is None or next_release < next_arrival:
+                    next_arrival = next_release
+
+            # and so is the expiry of the queued task batch with the earliest latest start
+            if self.admission is not None and self.admission.heap and not self.dispatcher.empty():
+                next_expiry = max(self.admission.heap[0][0] + 1, self.time + 1)
+                if next_arrival is None or next_expiry < next_arrival:
+                    next_arrival = next_expiry
+
+            busy = [executor for executor in self.executors if executor.task_batch is not None]
+            if not busy:
+                if next_arrival is None:
+                    self.time = self.time + 1
+                else:
+                    self.time = next_arrival
+                continue
+
+            finish_time = self.time + min(executor.task_batch.remain_time for executor in busy) - 1
+            if next_arrival is None or finish_time < next_arrival:
+                # some task batches finish before the next frame arrives
+                elapsed = finish_time - self.time + 1
+                self.time = finish_time
+                for executor in busy:
+                    executor.run(elapsed)
+                    if executor.task_batch.remain_time == 0:
+                        self.finish_task_batch(executor.finish())
+                self.time = self.time + 1
+            else:
+                # all task batches in flight run until the next frame arrives
+                for executor in busy:
+                    executor.run(next_arrival - self.time)
+                self.time = next_arrival
+
+    def has_pending_work(self):
+        """Return True if a task batch is waiting or in flight."""
+        if not self.dispatcher.empty():
+            return True
+        if self.batch_former is not None and not self.batch_former.empty():
+            return True
+        for executor in self.executors:
+            if executor.task_batch is not None:
+                return True
+        return False
+
+    def get_miss_rate(self):
+        """Return the fraction of finished tasks that missed their deadline."""
+        if self.task_finish_count == 0:
+            return 0
+        return self.task_missed_count / self.task_finish_count
+
+    def get_drop_rate(self):
+        """Return the fraction of tasks dropped by admission control."""
+        if self.task_finish_count + self.task_dropped_count == 0:
+            return 0
+        return self.task_dropped_count / (self.task_finish_count + self.task_dropped_count)
+
+    def get_executor_utilization(self):
+        """Return the fraction of the simulated time each executor was busy."""
+        if self.time == 0:
+            return [0] * len(self.executors)
+        return [float("{:.3f}".format(executor.busy_time / self.time)) for executor in self.executors]
+
+    def finish_task_batch(self, task_batch):
+        """Record a task batch that has finished at the current time."""
+        self.task_batch_finish_count = self.task_batch_finish_count + 1
+        self.task_finish_count = self.task_finish_count + task_batch.batch_size
+        task_batch.set_task_order(self.task_batch_finish_count)
+        for task in task_batch.tasks:
+            task.response_time = self.get_response_time(task)
+            if task.response_time > task.deadline:
+                task.missed = 1
+                self.task_missed_count = self.task_missed_count + 1
+
+            self.history.append(task)
+
+        if self.response_histogram is not None:
+            self.response_histogram.add_tasks(task_batch.tasks)
+
+    def get_response_time(self, task):
+        """Return the response time of a task finishing at the current time.
+
+        The task batch finishes at the end of the current time unit. Tasks
+        grouped by the batch former were enqueued at different times, so it is
+        computed per task.
+        """
+        return self.time - task.enqueue_time + 1
 
     def get_frame(self, frame_number):
         """Return and Image() object with the specified frame number."""
         if frame_number < self.max_frame_number:
             image_path = self.image_list[frame_number]
+            if self.frame_loader:
+                self.frame_loader.advance(frame_number)
+                return Image(image_path, self.frame_loader, frame_number)
+            if self.frame_store:
+                return Image(image_path, read_frame = self.frame_store.read_frame)
             return Image(image_path)
 
         else:
@@ -97,7 +482,12 @@ class Scheduler:
 
 
     def enqueue_task(self, task_set):
-        """Enqueue the task_set into the run queue."""
+        """Enqueue the task_set into the run queue.
+
+        The cluster boxes of the tasks are recorded in scheduled_boxes and fed
+        to the evaluator, if any.
+        """
+        frame_boxes = {}
         for task_batch in task_set:
 
             # record cluster boxes
@@ -105,19 +495,127 @@ class Scheduler:
                 i = task.image_path.rfind('/')
             
                 image_name = task.image_path[i+1:]
-                if image_name not in self.scheduled_boxes:
-                    tmp = task.coord[:]
-                    tmp.append(task.depth)
-                    self.scheduled_boxes[image_name] = [tmp]
-                else:
-                    tmp = task.coord[:]
-                    tmp.append(task.depth)
-                    self.scheduled_boxes[image_name].append(tmp)
+                tmp = task.coord[:]
+                tmp.append(task.depth)
+                frame_boxes.setdefault(image_name, []).append(tmp)
 
             task_batch.set_enqueue_time(self.time)
+
+        for image_name in frame_boxes:
+            if self.box_log is not None:
+                self.box_log.write({"image": image_name, "boxes": frame_boxes[image_name]})
+            else:
+                self.scheduled_boxes.setdefault(image_name, []).extend(frame_boxes[image_name])
+            if self.evaluator is not None:
+                self.evaluator.add(image_name, frame_boxes[image_name], complete = True)
+
+        if self.batch_former is not None:
+            self.next_frame = []
+            for task_batch in task_set:
+                expected = TaskBatch(task_batch.tasks, task_batch.img_height,
+                                     task_batch.img_width, task_batch.priority)
+                expected.enqueue_time = self.time + self.frame_period
+                expected.deadline = task_batch.deadline
+                expected.remain_time = self.get_execution_time(task_batch)
+                self.next_frame.append(expected)
+
+            ready = []
+            for task_batch in task_set:
+                ready.extend(self.batch_former.add(task_batch))
+            task_set = ready
+
+        self.submit_task_batches(task_set)
+
+    def submit_task_batches(self, task_set):
+        """Set the execution time of task batches and add them to the run queue.
+
+        With admission control, task batches that cannot meet their deadline
+        are dropped instead.
+        """
+        for task_batch in task_set:
             task_batch.remain_time = self.get_execution_time(task_batch)
             task_batch.set_exec_time(task_batch.remain_time)
-            self.run_queue.put(task_batch)
+
+        if self.admission is not None:
+            admitted = []
+            for task_batch in task_set:
+                if self.admission.admit(task_batch, self.time):
+                    admitted.append(task_batch)
+                else:
+                    self.drop_task_batch(task_batch)
+            task_set = admitted
+
+        self.dispatcher.enqueue(task_set)
+
+    def expire_task_batches(self):
+        """Drop the queued task batches that cannot meet their deadline anymore."""
+        for task_batch in self.admission.expire(self.time):
+            self.drop_task_batch(task_batch)
+
+    def drop_task_batch(self, task_batch):
+        """Record the tasks of a task batch dropped by admission control as missed."""
+        self.task_dropped_count = self.task_dropped_count + task_batch.batch_size
+        for task in task_batch.tasks:
+            task.missed = 1
+            self.dropped.append(task)
+
+    def start_delay(self, task_batch):
+        """Return how long task_batch would wait in the run queue if it was queued now.
+
+        It waits until an executor is free, since task batches in flight are
+        only preempted when a frame arrives, and then for the waiting task
+        batches the policy runs first, shared by the executors.
+        """
+        key = self.policy.key(task_batch)
+        ahead = 0
+        for queued in self.dispatcher:
+            if self.policy.key(queued) <= key:
+                ahead = ahead + queued.remain_time
+
+        busy = [executor.task_batch.remain_time for executor in self.executors
+                if executor.task_batch is not None]
+        free = min(busy) if len(busy) == len(self.executors) else 0
+        return free + -(-ahead // len(self.executors))
+
+    def response_time(self, task_batch):
+        """Return how long task_batch would take to finish if it was queued now.
+
+        On top of its start delay and remain_time, each frame arriving in the
+        meantime is expected to bring the task batches of next_frame, and the
+        ones the policy runs first delay task_batch too. As in the response
+        time analysis of periodic tasks, the response time R is the fixed point
+        of R = start delay + remain_time + ceil(R / frame_period) * that work.
+
+        Returns:
+            The response time, or math.inf if the frames bring more work ahead
+            of task_batch than the executors can run in a frame period.
+        """
+        key = self.policy.key(task_batch)
+        work = 0
+        for expected in self.next_frame:
+            if self.policy.key(expected) <= key:
+                work = work + expected.remain_time
+        work = -(-work // len(self.executors))
+        if work >= self.frame_period:
+            return math.inf
+
+        base = self.start_delay(task_batch) + task_batch.remain_time
+        response = base
+        while True:
+            total = base + -(-response // self.frame_period) * work
+            if total == response:
+                return response
+            response = total
+
+    def release_formed_batches(self):
+        """Queue the task batches the batch former releases at the current time.
+
+        Once no frame is expected anymore, every waiting task is released.
+        """
+        flush = self.frame_number >= self.max_frame_number
+        task_set = self.batch_former.release(self.time, flush)
+        if task_set:
+            self.submit_task_batches(task_set)
 
 
     def frame_arrival(self, frame_number):
@@ -132,13 +630,16 @@ class Scheduler:
         """
         frame = self.get_frame(frame_number)
         if frame:
-            task_set = process_frame(frame)
+            task_set = self.process_frame(frame)
             self.enqueue_task(task_set)
 
 
     def get_execution_time(self, task_batch):
-        """Return a simulated execution time for this task_batch."""
-        return int(5e-5 * task_batch.img_height * task_batch.img_width + (task_batch.batch_size-1) * 2) + 1
+        """Return a simulated execution time for this task_batch.
+
+        The default LinearCostModel is int(5e-5 * h * w + (batch_size-1) * 2) + 1.
+        """
+        return self.exec_time_model(task_batch)
 
 
     def print_image_list(self):
@@ -147,6 +648,14 @@ class Scheduler:
         print(self.image_list)
 
 
+    def history_entries(self):
+        """Return an iterable of the finished tasks as dictionaries, in finish order.
+
+        It works for every history: a list of TaskEntity, a HistoryStore, or
+        the JSON lines history_file, which is read back.
+        """
+        return history_entries(self.history)
+
     def print_history(self):
         """Print out the scheduling history of the scheduler."""
         dash = '-' * 70
@@ -156,63 +665,54 @@ class Scheduler:
             "count", "task_image", "img_coordinates", "depth", "priority",
             "enqueue_time", "exec_time", "response_time", "deadline", "missed"))
 
-        i = 1
-        for entry in self.history:
-            print('{:<7d}{:s}'.format(i, entry.print()))
-            i = i + 1
+        for i, entry in enumerate(self.history_entries()):
+            print('{:<7d}{:s}'.format(i + 1, format_history_entry(entry)))
         print(dash)
-        print("deadline miss rate is: ", self.task_missed_count / self.task_finish_count)
+        print("deadline miss rate is: ", self.get_miss_rate())
     
 
-    def save_history(self):
-        """Save the scheduling history as a json file."""
-        d = {}
-        i = 1
-        for entry in self.history:
-            d[i] = entry.__dict__
-            i = i + 1
+    def save_history(self, output_directory = "."):
+        """Save the scheduling history as json files in output_directory.
+
+        When the history is streamed to history_file, only scheduled_boxes.json
+        is written. Tasks dropped by admission control are saved to
+        dropped_tasks.json.
+        """
+        os.makedirs(output_directory, exist_ok=True)
+        if self.admission is not None:
+            dropped = {}
+            for i, entry in enumerate(history_entries(self.dropped)):
+                dropped[i + 1] = entry
+            with open(os.path.join(output_directory, 'dropped_tasks.json'), 'w') as outfile:
+                json.dump(dropped, outfile, ensure_ascii=False, indent=4)
+
+        if self.history_file:
+            with open(os.path.join(output_directory, 'scheduled_boxes.json'), 'w') as outfile:
+                json.dump(self.scheduled_boxes, outfile, ensure_ascii=False, indent=4)
+            return
+
+        if isinstance(self.history, HistoryStore):
+            d = self.history.to_dict()
+        else:
+            d = {}
+            i = 1
+            for entry in self.history:
+                d[i] = entry.__dict__
+                i = i + 1
         
-        with open('scheduling_history.json', 'w') as outfile:
+        with open(os.path.join(output_directory, 'scheduling_history.json'), 'w') as outfile:
             json.dump(d, outfile, ensure_ascii=False, indent=4)
 
-        with open('scheduled_boxes.json', 'w') as outfile:
+        with open(os.path.join(output_directory, 'scheduled_boxes.json'), 'w') as outfile:
             json.dump(self.scheduled_boxes, outfile, ensure_ascii=False, indent=4)
         
 
-    def visualize_history(self, Text_colors=(255,255,255)):
+    def visualize_history(self, Text_colors=(255,255,255), processes=None, png_compression=3):
         """Visualize scheduling order.
 
         Draw the scheduling order of bounding boxes in the image_out_path.
         Blue for box that meet deadline and red for box that missed.      
+        Each image is decoded and written once, see render_history().
         """
-        order = 1
-        for task in self.history:
-            if os.path.exists(task.image_out_path):
-                image = cv2.imread(task.image_out_path)
-            else:
-                image = cv2.imread(task.image_path)
-            image_h, image_w, _ = image.shape
-
-            bbox_color = (0,0,255) if (task.missed) else (255,0,0)
-            bbox_thick = int(0.6 * (image_h + image_w) / 1000)
-            if bbox_thick < 1: bbox_thick = 1
-            fontScale = 0.75 * bbox_thick
-            coor = task.coord
-            (x1, y1), (x2, y2) = (coor[0], coor[1]), (coor[2], coor[3])
-
-            # put object rectangle
-            cv2.rectangle(image, (x1, y1), (x2, y2), bbox_color, bbox_thick*2)
-            order_text = "order: " + str(order)
-            # get text size
-            (text_width, text_height), baseline = cv2.getTextSize(order_text, cv2.FONT_HERSHEY_COMPLEX_SMALL,
-                                                                    fontScale, thickness=bbox_thick)
-            # put filled text rectangle
-            cv2.rectangle(image, (x1, y1), (x1 + text_width, y1 - text_height - baseline), bbox_color, thickness=cv2.FILLED)
-
-            # put text above rectangle
-            cv2.putText(image, order_text, (x1, y1-4), cv2.FONT_HERSHEY_COMPLEX_SMALL,
-                        fontScale, Text_colors, bbox_thick, lineType=cv2.LINE_AA)
-            
-            cv2.imwrite(task.image_out_path, image)
-
-            order = order + 1
\ No newline at end of file
+        frame_store = self.frame_store.directory if self.frame_store else None
+        render_history(enumerate(self.history_entries(), 1), Text_colors, processes, png_compression, frame_store)
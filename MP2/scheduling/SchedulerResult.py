@@ -0,0 +1,91 @@
+from scheduling.misc import *
+from scheduling.HistoryStore import HistoryStore
+from scheduling.HistoryWriter import JsonlHistoryWriter
+
+
+class SchedulerResult:
+    """The outcome of Scheduler.run(), kept in memory.
+
+    Attributes:
+        history: the finished tasks: a list of TaskEntity, a HistoryStore, or the
+                path of the JSON lines file they were streamed to.
+        scheduled_boxes: cluster boxes scheduled, by frame name.
+        dropped: tasks dropped by admission control: a list of TaskEntity, or the
+                path of the JSON lines file they were streamed to.
+        time: the simulated time at the end of the run.
+        task_finish_count: number of tasks that have finished.
+        task_batch_finish_count: number of task batches that have finished.
+        task_missed_count: number of tasks that missed deadline.
+        task_dropped_count: number of tasks dropped by admission control.
+        miss_rate: fraction of finished tasks that missed their deadline.
+        drop_rate: fraction of tasks dropped by admission control.
+        executor_utilization: fraction of the time each executor was busy.
+        coverage: average coverage from the scheduler's evaluator, or None.
+        accuracy: average accuracy from the scheduler's evaluator, or None.
+        instrumentation: the instrumentation report, or None.
+    """
+    def __init__(self, scheduler):
+        if scheduler.history_file:
+            self.history = scheduler.history_file
+        else:
+            self.history = scheduler.history
+        self.scheduled_boxes = scheduler.scheduled_boxes
+        if isinstance(scheduler.dropped, JsonlHistoryWriter):
+            self.dropped = scheduler.dropped.path
+        else:
+            self.dropped = scheduler.dropped
+        self.time = scheduler.time
+        self.task_finish_count = scheduler.task_finish_count
+        self.task_batch_finish_count = scheduler.task_batch_finish_count
+        self.task_missed_count = scheduler.task_missed_count
+        self.task_dropped_count = scheduler.task_dropped_count
+        self.miss_rate = scheduler.get_miss_rate()
+        self.drop_rate = scheduler.get_drop_rate()
+        self.executor_utilization = scheduler.get_executor_utilization()
+        if scheduler.evaluator is not None:
+            self.coverage, self.accuracy = scheduler.evaluator.result()
+        else:
+            self.coverage, self.accuracy = None, None
+        if scheduler.instrumentation:
+            self.instrumentation = scheduler.instrumentation.report()
+        else:
+            self.instrumentation = None
+
+    def entries(self):
+        """Return an iterable of the finished tasks as dictionaries, in finish order."""
+        return history_entries(self.history)
+
+    def dropped_entries(self):
+        """Return an iterable of the dropped tasks as dictionaries, in drop order."""
+        return history_entries(self.dropped)
+
+    def history_dict(self):
+        """Return the history as the dictionary saved to scheduling_history.json."""
+        if isinstance(self.history, HistoryStore):
+            return self.history.to_dict()
+        d = {}
+        for i, entry in enumerate(self.entries()):
+            d[i + 1] = entry
+        return d
+
+    def group_avg_response_time(self):
+        """Return get_group_avg_response_time() of the history."""
+        if isinstance(self.history, HistoryStore):
+            return self.history.group_avg_response_time()
+        return get_group_avg_response_time(self.entries())
+
+    def group_worst_response_time(self):
+        """Return get_group_worst_response_time() of the history."""
+        if isinstance(self.history, HistoryStore):
+            return self.history.group_worst_response_time()
+        return get_group_worst_response_time(self.entries())
+
+    def print_summary(self):
+        """Print the deadline miss rate, quality and executor utilization."""
+        print("deadline miss rate is: ", self.miss_rate)
+        if self.task_dropped_count:
+            print("drop rate is: ", self.drop_rate)
+        if self.coverage is not None:
+            print("average coverage: %.3f" % (self.coverage))
+            print("average accuracy: %.3f" % (self.accuracy))
+        print("executor utilization is: ", self.executor_utilization)
@@ -4,11 +4,29 @@ class Image:
     """ Image class.
 
     A object with image data and original image path. 
+    The image data is only decoded when the image attribute is first read,
+    from a FrameLoader if one is given, so that it can be prefetched, else
+    with read_frame, such as FrameStore.read_frame or cv2.imread (default).
     """
-    def __init__(self, path):
+    def __init__(self, path, loader = None, frame_number = 0, read_frame = None):
         self.path = path
-        # setting to 0 to save some memory space
-        self.image = 0
+        self.loader = loader
+        self.frame_number = frame_number
+        self.read_frame = read_frame
+        # decoded lazily to save some memory space
+        self._image = None
+
+    @property
+    def image(self):
+        """The decoded image data."""
+        if self._image is None:
+            if self.loader is not None:
+                self._image = self.loader.get(self.frame_number)
+            elif self.read_frame is not None:
+                self._image = self.read_frame(self.path)
+            else:
+                self._image = cv2.imread(self.path)
+        return self._image
         
 
 class TaskBatch:
@@ -27,6 +45,7 @@ class TaskBatch:
                 see if this task has finished execution.
         enqueue_time: the time instance that this task is added to the scheduler run queue.
                 This field is filled by the scheduler.
+        deadline: the earliest deadline of the tasks in the batch, relative to enqueue_time.
 
     """
     def __init__(self, tasks, img_height, img_width, priority = 0):
@@ -37,6 +56,10 @@ class TaskBatch:
         self.img_height = img_height
         self.img_width = img_width
         self.priority = priority
+        if tasks:
+            self.deadline = min(task.deadline for task in tasks)
+        else:
+            self.deadline = 100
 
     def set_enqueue_time(self, time):
         """Set enqueue_time for tasks in the batch."""
@@ -151,7 +174,7 @@ class TaskEntity:
     def set_deadline(self, depth):
         """Set task deadline based on depth."""
         dl_table = [30, 50, 60, 70, 80, 100, 100, 100, 100, 100]
-        self.deadline = dl_table[int(depth/10)]
+        self.deadline = dl_table[min(int(depth/10), len(dl_table) - 1)]
 
     def print(self):
         """Return a string showing important task information for printing."""
@@ -0,0 +1,203 @@
+import numpy as np
+from scheduling.HistoryStore import HistoryStore
+
+
+# edges of the 10m depth groups used by get_group_avg_response_time()
+DEPTH_BINS = np.arange(0, 110, 10)
+PERCENTILES = (50, 95, 99)
+
+
+def depth_group_ids(depth, bins = DEPTH_BINS):
+    """Return the depth group of each depth.
+
+    Group i holds depths in [bins[i], bins[i+1]). Depths below bins[0] fall in
+    the first group and depths from bins[-1] on in the last one, so every depth
+    has a group.
+    """
+    group_id = np.searchsorted(bins, depth, side="right") - 1
+    return np.clip(group_id, 0, len(bins) - 2)
+
+
+def history_columns(history):
+    """Return the depth, response_time and missed columns of a scheduling history.
+
+    Args:
+        history: a HistoryStore, a dictionary of scheduling history read from a
+                json file, or an iterable of entries or TaskEntity objects, such
+                as Scheduler.history or read_history_jsonl().
+
+    Returns:
+        A tuple of three NumPy arrays.
+    """
+    if isinstance(history, HistoryStore):
+        return (history.column("depth"), history.column("response_time"),
+                history.column("missed"))
+    if isinstance(history, dict):
+        history = history.values()
+
+    depth, response_time, missed = [], [], []
+    for entry in history:
+        if not isinstance(entry, dict):
+            entry = entry.__dict__
+        depth.append(entry["depth"])
+        response_time.append(entry["response_time"])
+        missed.append(entry["missed"])
+    return (np.array(depth, dtype=np.float64), np.array(response_time, dtype=np.float64),
+            np.array(missed, dtype=np.int64))
+
+
+def group_table(bins, count, total, worst, missed, percentile_values, percentiles):
+    """Assemble the per-group results of response_time_statistics()."""
+    table = []
+    for i in range(len(bins) - 1):
+        row = {"depth_range": [float(bins[i]), float(bins[i + 1])], "count": int(count[i])}
+        if count[i]:
+            row["mean"] = float(total[i] / count[i])
+            for q, values in zip(percentiles, percentile_values):
+                row["p{:g}".format(q)] = float(values[i])
+            row["max"] = float(worst[i])
+            row["miss_rate"] = float(missed[i] / count[i])
+        else:
+            row["mean"] = 0.0
+            for q in percentiles:
+                row["p{:g}".format(q)] = 0.0
+            row["max"] = 0.0
+            row["miss_rate"] = 0.0
+        table.append(row)
+    return table
+
+
+def response_time_statistics(history, bins = DEPTH_BINS, percentiles = PERCENTILES):
+    """Response time statistics for each depth group.
+
+    All groups are computed at once: the tasks are sorted by group and response
+    time, and the percentiles of every group are read from the sorted array
+    with the linear interpolation of np.quantile.
+
+    Args:
+        history: any history accepted by history_columns().
+        bins: increasing edges of the depth groups, in meters.
+        percentiles: the response time percentiles to report.
+
+    Returns:
+        A list with a dictionary per depth group, with the keys depth_range,
+        count, mean, p50, p95, p99 (one per percentile), max and miss_rate.
+    """
+    bins = np.asarray(bins, dtype=np.float64)
+    depth, response_time, missed = history_columns(history)
+    num_groups = len(bins) - 1
+    group_id = depth_group_ids(depth, bins)
+
+    count = np.bincount(group_id, minlength=num_groups)
+    total = np.bincount(group_id, weights=response_time, minlength=num_groups)
+    missed = np.bincount(group_id, weights=missed, minlength=num_groups)
+
+    order = np.lexsort((response_time, group_id))
+    ordered = np.append(response_time[order], 0)
+    # empty groups read the padding element
+    start = np.where(count > 0, np.cumsum(count) - count, len(ordered) - 1)
+    last = np.maximum(count - 1, 0)
+    worst = ordered[start + last]
+
+    percentile_values = []
+    for q in percentiles:
+        position = last * (q / 100)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, last)
+        low_value = ordered[start + lower]
+        high_value = ordered[start + upper]
+        percentile_values.append(low_value + (high_value - low_value) * (position - lower))
+
+    return group_table(bins, count, total, worst, missed, percentile_values, percentiles)
+
+
+class ResponseTimeHistogram:
+    """Online histogram of response times per depth group.
+
+    Counts are kept per depth group and response time bucket, so the histogram
+    can be updated as tasks finish and merged with histograms of other runs or
+    processes. Counts, means, maxima and miss rates are exact. Percentiles are
+    exact when response times are multiples of bucket_width below max_response_time,
+    as in the simulation with the default width of 1.
+
+    Attributes:
+        bins: edges of the depth groups.
+        bucket_width: width of a response time bucket.
+        max_response_time: response times from this value on share the last bucket.
+        counts: number of tasks per depth group and response time bucket.
+        total: sum of the response times per depth group.
+        worst: largest response time per depth group.
+        missed: number of tasks that missed their deadline per depth group.
+    """
+    def __init__(self, bins = DEPTH_BINS, bucket_width = 1, max_response_time = 1000):
+        self.bins = np.asarray(bins, dtype=np.float64)
+        self.bucket_width = bucket_width
+        self.max_response_time = max_response_time
+        num_groups = len(self.bins) - 1
+        num_buckets = int(np.ceil(max_response_time / bucket_width)) + 1
+        self.counts = np.zeros((num_groups, num_buckets), dtype=np.int64)
+        self.total = np.zeros(num_groups, dtype=np.float64)
+        self.worst = np.zeros(num_groups, dtype=np.float64)
+        self.missed = np.zeros(num_groups, dtype=np.int64)
+
+    def add(self, depth, response_time, missed = 0):
+        """Add one finished task."""
+        group_id = int(depth_group_ids(depth, self.bins))
+        bucket = min(int(response_time // self.bucket_width), self.counts.shape[1] - 1)
+        self.counts[group_id, bucket] += 1
+        self.total[group_id] += response_time
+        if response_time > self.worst[group_id]:
+            self.worst[group_id] = response_time
+        self.missed[group_id] += missed
+
+    def add_tasks(self, tasks):
+        """Add finished TaskEntity objects, such as the tasks of a TaskBatch."""
+        for task in tasks:
+            self.add(task.depth, task.response_time, task.missed)
+
+    def update(self, history):
+        """Add every task of a history accepted by history_columns()."""
+        depth, response_time, missed = history_columns(history)
+        group_id = depth_group_ids(depth, self.bins)
+        bucket = np.minimum((response_time // self.bucket_width).astype(np.int64),
+                            self.counts.shape[1] - 1)
+        np.add.at(self.counts, (group_id, bucket), 1)
+        num_groups = len(self.total)
+        self.total += np.bincount(group_id, weights=response_time, minlength=num_groups)
+        self.missed += np.bincount(group_id, weights=missed, minlength=num_groups).astype(np.int64)
+        np.maximum.at(self.worst, group_id, response_time)
+
+    def merge(self, other):
+        """Add the counts of another histogram with the same bins and buckets."""
+        if (not np.array_equal(self.bins, other.bins) or self.counts.shape != other.counts.shape
+                or self.bucket_width != other.bucket_width):
+            raise ValueError("histograms have different bins or buckets")
+        self.counts += other.counts
+        self.total += other.total
+        self.missed += other.missed
+        np.maximum(self.worst, other.worst, out=self.worst)
+
+    def statistics(self, percentiles = PERCENTILES):
+        """Return the statistics of response_time_statistics() from the counts."""
+        count = self.counts.sum(axis=1)
+        cumulative = np.cumsum(self.counts, axis=1)
+        last = np.maximum(count - 1, 0)
+
+        def order_statistic(rank):
+            # value of the rank-th smallest response time of each group
+            bucket = np.array([np.searchsorted(cumulative[i], rank[i], side="right")
+                               for i in range(len(count))])
+            bucket = np.minimum(bucket, self.counts.shape[1] - 1)
+            return bucket * self.bucket_width
+
+        percentile_values = []
+        for q in percentiles:
+            position = last * (q / 100)
+            lower = np.floor(position).astype(np.int64)
+            upper = np.minimum(lower + 1, last)
+            low_value = order_statistic(lower)
+            high_value = order_statistic(upper)
+            percentile_values.append(low_value + (high_value - low_value) * (position - lower))
+
+        return group_table(self.bins, count, self.total, self.worst, self.missed,
+                           percentile_values, percentiles)
@@ -0,0 +1,117 @@
+import numpy as np
+
+
+DEPTH_AGGREGATES = ("min", "max", "mean", "first")
+
+
+def overlapping_pairs(coords):
+    """Find all pairs of overlapping boxes with a sort-and-sweep on x.
+
+    Boxes are sorted by their left edge. For each box, only the boxes whose left
+    edge lies within its x range are candidates, found with a binary search.
+    Candidates are then filtered on the y range. Boxes that only touch count as
+    overlapping.
+
+    Args:
+        coords: an (n, 4) array of [x0, y0, x1, y1] boxes.
+
+    Returns:
+        Two arrays i, j of box indices, one entry per overlapping pair.
+    """
+    order = np.argsort(coords[:, 0], kind="stable")
+    x0 = coords[order, 0]
+    x1 = coords[order, 2]
+
+    # candidates of sorted box k are sorted boxes k+1 .. end[k]-1
+    end = np.searchsorted(x0, x1, side="right")
+    start = np.arange(1, len(order) + 1)
+    count = np.maximum(end - start, 0)
+    if count.sum() == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+
+    first = np.repeat(np.arange(len(order)), count)
+    offset = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+    second = first + 1 + offset
+
+    i = order[first]
+    j = order[second]
+    overlap = (coords[i, 1] <= coords[j, 3]) & (coords[j, 1] <= coords[i, 3])
+    return i[overlap], j[overlap]
+
+
+def connected_components(n, i, j):
+    """Label the connected components of n nodes linked by the pairs (i, j).
+
+    Uses union-find with path halving. Every component is labelled with its
+    lowest node index.
+    """
+    parent = list(range(n))
+
+    def find(a):
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        return a
+
+    for a, b in zip(i.tolist(), j.tolist()):
+        root_a = find(a)
+        root_b = find(b)
+        if root_a < root_b:
+            parent[root_b] = root_a
+        elif root_b < root_a:
+            parent[root_a] = root_b
+
+    return np.array([find(a) for a in range(n)], dtype=np.int64)
+
+
+def merge_boxes(boxes, depth = "min"):
+    """Merge overlapping boxes into their bounding boxes.
+
+    Boxes that overlap, directly or through a chain of other overlapping boxes,
+    are merged into one box covering all of them.
+
+    Args:
+        boxes: a list of [x0, y0, x1, y1, depth, ...] boxes, such as returned by
+                get_cluster_box_info(). Fields after depth are ignored.
+        depth: how the depth of a merged box is computed from its boxes. "min"
+                takes the nearest object, "max" the farthest, "mean" the average and
+                "first" the depth of the first box in the input.
+
+    Returns:
+        A list of merged [x0, y0, x1, y1, depth] boxes, in the order of the first
+        box of each merged box in the input.
+    """
+    if depth not in DEPTH_AGGREGATES:
+        raise ValueError("Unknown depth aggregate {:s}".format(str(depth)))
+    if len(boxes) == 0:
+        return []
+
+    coords = np.array([box[0:4] for box in boxes], dtype=np.int64)
+    depths = np.array([box[4] for box in boxes], dtype=np.float64)
+
+    labels = connected_components(len(boxes), *overlapping_pairs(coords))
+    # labels are the lowest index in each component, so they follow input order
+    roots, group = np.unique(labels, return_inverse=True)
+    group = group.reshape(-1)
+
+    merged = np.empty((len(roots), 4), dtype=np.int64)
+    merged[:, 0:2] = np.iinfo(np.int64).max
+    merged[:, 2:4] = np.iinfo(np.int64).min
+    np.minimum.at(merged[:, 0], group, coords[:, 0])
+    np.minimum.at(merged[:, 1], group, coords[:, 1])
+    np.maximum.at(merged[:, 2], group, coords[:, 2])
+    np.maximum.at(merged[:, 3], group, coords[:, 3])
+
+    if depth == "min":
+        merged_depth = np.full(len(roots), np.inf)
+        np.minimum.at(merged_depth, group, depths)
+    elif depth == "max":
+        merged_depth = np.full(len(roots), -np.inf)
+        np.maximum.at(merged_depth, group, depths)
+    elif depth == "mean":
+        merged_depth = np.bincount(group, weights=depths) / np.bincount(group)
+    else:
+        merged_depth = depths[roots]
+
+    return [box + [d] for box, d in zip(merged.tolist(), merged_depth.tolist())]
@@ -4,51 +4,27 @@ import os
 import numpy as np
 import json
 import sys
+from scheduling.BoxStore import BoxStore, load_box_info
+from scheduling.HistoryStore import HistoryStore
+from scheduling.HistoryWriter import JsonlHistoryWriter
+from scheduling.render import render_history
 
 
-def visualize_history_file(history, Text_colors=(255,255,255)):
+def visualize_history_file(history, Text_colors=(255,255,255), processes=None, png_compression=3,
+                           frame_store=None):
     """Visualize scheduling history from dictionary.
 
     Draw the scheduling order of bounding boxes in the image_out_path.
     Blue for box that meet deadline and red for box that missed.
+    Each image is decoded and written once, see render_history().
 
     Args:
         history: A dictionary of scheduling history read from json file. 
+        processes: size of the process pool rendering the images.
+        png_compression: PNG compression level from 0 to 9.
+        frame_store: directory of a FrameStore holding the frames, or None.
     """
-    for order in history:
-        entry = history[order]
-        if os.path.exists(entry["image_out_path"]):
-            image = cv2.imread(entry["image_out_path"])
-        else:
-            image = cv2.imread(entry["image_path"])
-        image_h, image_w, _ = image.shape
-
-        bbox_color = (0,0,255) if (entry["missed"]) else (255,0,0)
-        bbox_thick = int(0.6 * (image_h + image_w) / 1000)
-        if bbox_thick < 1: bbox_thick = 1
-        fontScale = 0.75 * bbox_thick
-        coor = entry["coord"]
-        (x1, y1), (x2, y2) = (coor[0], coor[1]), (coor[2], coor[3])
-
-        # put object rectangle
-        cv2.rectangle(image, (x1, y1), (x2, y2), bbox_color, bbox_thick*2)
-        order_text = "order: " + str(order)
-        # get text size
-        (text_width, text_height), baseline = cv2.getTextSize(order_text, cv2.FONT_HERSHEY_COMPLEX_SMALL,
-                                                                fontScale, thickness=bbox_thick)
-        # put filled text rectangle
-        cv2.rectangle(image, (x1, y1), (x1 + text_width, y1 - text_height - baseline), bbox_color, thickness=cv2.FILLED)
-
-        # put text above rectangle
-        cv2.putText(image, order_text, (x1, y1-4), cv2.FONT_HERSHEY_COMPLEX_SMALL,
-                    fontScale, Text_colors, bbox_thick, lineType=cv2.LINE_AA)
-        
-        i = entry["image_out_path"].rfind('/')
-        output_directory = entry["image_out_path"][:i]
-        if not os.path.exists(output_directory):
-            os.makedirs(output_directory)
-                
-        cv2.imwrite(entry["image_out_path"], image)
+    render_history(history.items(), Text_colors, processes, png_compression, frame_store)
 
 
 def get_group_avg_response_time(history):
@@ -56,10 +32,12 @@ def get_group_avg_response_time(history):
 
     Use the scheduling history to calculate the average response time for 
     each depth group. Each group is composed of objects that are in a 10m
-    range, such as 0-10m, 10-20m, etc..
+    range, such as 0-10m, 10-20m, etc.. See response_time_statistics() in
+    analytics.py for percentiles and configurable groups.
 
     Args:
-        history: A dictionary of scheduling history read from json file. 
+        history: A dictionary of scheduling history read from json file, or 
+            entries read with read_history_jsonl().
     
     Returns:
         A list of response time for each depth group. 
@@ -71,9 +49,9 @@ def get_group_avg_response_time(history):
     group_cnt = [0] * 10
     result = []
 
-    for key in history:
-        entry = history[key]
-        group_id = int(entry["depth"] / 10)
+    for entry in history_entries(history):
+        # depths of 100m or more count in the last group
+        group_id = min(int(entry["depth"] / 10), 9)
         res_time[group_id] += entry["response_time"]
         group_cnt[group_id] += 1
     
@@ -91,10 +69,12 @@ def get_group_worst_response_time(history):
 
     Use the scheduling history to calculate the average response time for 
     each depth group. Each group is composed of objects that are in a 10m
-    range, such as 0-10m, 10-20m, etc..
+    range, such as 0-10m, 10-20m, etc.. See response_time_statistics() in
+    analytics.py for percentiles and configurable groups.
 
     Args:
-        history: A dictionary of scheduling history read from json file. 
+        history: A dictionary of scheduling history read from json file, or 
+            entries read with read_history_jsonl().
     
     Returns:
         A list of response time for each depth group. 
@@ -104,15 +84,47 @@ def get_group_worst_response_time(history):
 
     res_time = [0] * 10
 
-    for key in history:
-        entry = history[key]
-        group_id = int(entry["depth"] / 10)
+    for entry in history_entries(history):
+        # depths of 100m or more count in the last group
+        group_id = min(int(entry["depth"] / 10), 9)
         if entry["response_time"] > res_time[group_id]:
             res_time[group_id] = entry["response_time"]
 
     return res_time
 
 
+def read_history_jsonl(filename):
+    """Yield the entries of a scheduling history streamed as JSON lines.
+
+    The file is read one line at a time, so memory stays flat for long runs.
+    """
+    with open(filename) as history_file:
+        for line in history_file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def history_entries(history):
+    """Return an iterable of the finished tasks of a history as dictionaries, in finish order.
+
+    Args:
+        history: a list of TaskEntity, a HistoryStore, a JsonlHistoryWriter,
+            which is flushed and read back, the path of a JSON lines history,
+            a dictionary of scheduling history read from a json file, or any
+            iterable of entries such as read_history_jsonl().
+    """
+    if isinstance(history, dict):
+        return history.values()
+    if isinstance(history, str):
+        return read_history_jsonl(history)
+    if isinstance(history, JsonlHistoryWriter):
+        history.flush()
+        return read_history_jsonl(history.path)
+    if isinstance(history, HistoryStore):
+        return iter(history)
+    return (task if isinstance(task, dict) else task.__dict__ for task in history)
+
+
 def extract_png_files(input_path):
     '''Find all png files within the given directory, sorted numerically.'''
     input_files = []
@@ -139,7 +151,7 @@ def get_cluster_box_info(frame, cluster_boxes):
 
     Args:
         frame: The image frame to be searched.
-        cluster_boxes: a dictionary containing bounding box data.
+        cluster_boxes: a dictionary containing bounding box data, or a BoxStore.
 
     Returns:
         A list with the related bounding box data, including coordinates, depth, etc..
@@ -154,7 +166,10 @@ def get_cluster_box_info(frame, cluster_boxes):
     i = image_path.rfind('/')
     image_name = image_path[i+1:]
 
-    if image_name in cluster_boxes:
+    if isinstance(cluster_boxes, BoxStore) and image_name in cluster_boxes:
+        # the store already holds typed values
+        return cluster_boxes.rows(image_name)
+    elif image_name in cluster_boxes:
         cluster_box_raw = cluster_boxes[image_name]
         cluster_box = []
         for entry in cluster_box_raw:
@@ -205,6 +220,20 @@ def list_to_str(l):
     return '(' + str(l[0]) + ',' + str(l[1]) + '), (' + str(l[2]) + ',' + str(l[3]) + ')'
 
 
+def format_history_entry(entry):
+    """Return a history entry, a dictionary like TaskEntity.__dict__, as a row of print_history().
+
+    The times are printed as they are stored, so the integer times of a
+    simulation and the fractional times of a real-time run both fit.
+    """
+    coord = entry["coord"]
+    if isinstance(coord, list):
+        coord = list_to_str(coord)
+    return '{:<32s}{:>25s}{:>8.3f}{:>10}{:>15}{:>12}{:>12.3f}{:>10}{:>10}'.format(
+            entry["image_path"], str(coord), entry["depth"], entry["priority"], entry["enqueue_time"],
+            entry["exec_time"], entry["response_time"], entry["deadline"], entry["missed"])
+
+
 def line_intersection(a0, a1, b0, b1):
     """Get intersection for a line.
     """
@@ -241,19 +270,67 @@ def set_image_pixel_value(pixels, box, value):
         pixels[i][box[0]-1:box[2]-1] = value
     
 
+def pixel_rectangles(box, height=1280, width=1920):
+    """Return the pixels set by set_image_pixel_value() as half-open rectangles.
+
+    set_image_pixel_value() sets rows box[1]-1 to box[3]-2 and columns box[0]-1
+    to box[2]-2 of a height x width array, with Python indexing rules. A box
+    starting at 0 therefore also sets the last row, and its column slice starts
+    at the last column. The pixels are returned as a list of
+    [x0, y0, x1, y1] rectangles that cover exactly the same pixels.
+    """
+    x0, x1, _ = slice(box[0]-1, box[2]-1).indices(width)
+    if x1 <= x0:
+        return []
+
+    y0 = max(box[1]-1, -height)
+    y1 = min(box[3]-1, height)
+    rectangles = []
+    if y0 < 0:
+        # negative row indices wrap around to the bottom of the frame
+        rectangles.append([x0, y0 + height, x1, min(y1, 0) + height])
+        y0 = 0
+    if y1 > y0:
+        rectangles.append([x0, y0, x1, y1])
+    return rectangles
+
+
+def union_area(rectangles):
+    """Return the area of the union of half-open [x0, y0, x1, y1] rectangles.
+
+    The rectangle edges are compressed into a grid of elementary cells, which
+    is only as large as the number of distinct edges.
+    """
+    if not rectangles:
+        return 0
+    boxes = np.array(rectangles, dtype=np.int64)
+    xs = np.unique(boxes[:, [0, 2]])
+    ys = np.unique(boxes[:, [1, 3]])
+    covered = np.zeros((len(ys) - 1, len(xs) - 1), dtype=bool)
+    ix = np.searchsorted(xs, boxes[:, [0, 2]])
+    iy = np.searchsorted(ys, boxes[:, [1, 3]])
+    for k in range(len(boxes)):
+        covered[iy[k, 0]:iy[k, 1], ix[k, 0]:ix[k, 1]] = True
+    return int(np.diff(ys) @ covered @ np.diff(xs))
+
+
 def get_statistics_per_image(image, ground_truth, cluster_box_info):
     """Get coverage and accuracy for a single frame.
+
+    The coverage of a ground truth box is the area of the union of its overlaps
+    with matching cluster boxes, counted on the same pixels as 
+    set_image_pixel_value() would set, divided by the area of the box.
     """
     if image in ground_truth and image in cluster_box_info:
         true_boxes = ground_truth[image]
         cluster_boxes = cluster_box_info[image]
         coverage = [0] * len(true_boxes)
         cluster_statistic = [0] * len(cluster_boxes)
-        pixel_array = np.zeros((len(true_boxes),1280,1920))
 
         i, j = 0, 0
         for entry in true_boxes:
             true_box = [entry[0], entry[1], entry[2], entry[3]]
+            covered = []
             j = 0
             for entry2 in cluster_boxes:
                 box = [int(entry2[0]), int(entry2[1]), int(entry2[2]), int(entry2[3])]
@@ -265,10 +342,10 @@ def get_statistics_per_image(image, ground_truth, cluster_box_info):
                     # update statistics
                     cluster_statistic[j] = 1
                     entry2[5] = 1
-                    set_image_pixel_value(pixel_array[i], overlap, 1)
+                    covered.extend(pixel_rectangles(overlap))
                 j += 1
             # calculate coverage for this bounding box
-            coverage[i] =  np.count_nonzero(pixel_array[i] == 1) / \
+            coverage[i] =  union_area(covered) / \
                     ((true_box[2] - true_box[0]) * (true_box[3] - true_box[1]))
             i += 1
         accuracy = sum(cluster_statistic) / len(cluster_statistic)
@@ -277,17 +354,19 @@ def get_statistics_per_image(image, ground_truth, cluster_box_info):
         return 0
 
 
-def get_statistics(ground_truth, cluster_box_info):
-    """Get average coverage for bounding boxes and accuracy for cluster boxes.
+def compute_statistics(ground_truth, cluster_box_info):
+    """Compute average coverage for bounding boxes and accuracy for cluster boxes.
 
-    Process the ground truth bounding boxes and cluster box information to get 
-    the average coverage for bounding boxes and accuracy for cluster boxes.
-    This function also adds a sixth field to scheduled_boxes.json indicating 
-    whether the box has some overlap with ground truth bounding boxes.
+    Same as get_statistics(), without writing scheduled_boxes.json or printing.
+    Cluster boxes in cluster_box_info still get the sixth field.
 
     Args:
         ground_truth: dictionary of Waymo ground truth bounding box.
-        cluster_box_info: dictionary of Waymo ground truth bounding box.
+        cluster_box_info: dictionary of scheduled cluster boxes.
+
+    Returns:
+        A list [coverage, accuracy]. Both are 0 if no frame has both ground truth
+        and cluster boxes.
     """
     avg_coverage = []
     avg_accuracy = []
@@ -296,8 +375,26 @@ def get_statistics(ground_truth, cluster_box_info):
         if result:
             avg_coverage.extend(result[0])
             avg_accuracy.append(result[1])
+    if not avg_coverage:
+        return [0, 0]
     coverage = sum(avg_coverage) / len(avg_coverage)
     accuracy = sum(avg_accuracy) / len(avg_accuracy)
+    return [coverage, accuracy]
+
+
+def get_statistics(ground_truth, cluster_box_info):
+    """Get average coverage for bounding boxes and accuracy for cluster boxes.
+
+    Process the ground truth bounding boxes and cluster box information to get 
+    the average coverage for bounding boxes and accuracy for cluster boxes.
+    This function also adds a sixth field to scheduled_boxes.json indicating 
+    whether the box has some overlap with ground truth bounding boxes.
+
+    Args:
+        ground_truth: dictionary of Waymo ground truth bounding box.
+        cluster_box_info: dictionary of Waymo ground truth bounding box.
+    """
+    coverage, accuracy = compute_statistics(ground_truth, cluster_box_info)
 
     with open('scheduled_boxes.json', 'w') as outfile:
         json.dump(cluster_box_info, outfile, ensure_ascii=False, indent=4)
@@ -306,7 +403,8 @@ def get_statistics(ground_truth, cluster_box_info):
     print("average accuracy: %.3f" % (accuracy))
 
 
-def visualize_boxes(image_folder, ground_truth, cluster_box_info, Text_colors=(255,255,255)):
+def visualize_boxes(image_folder, ground_truth, cluster_box_info, Text_colors=(255,255,255),
+                    frame_store=None):
     """Visualize scheduling history from dictionary.
 
     Draw the scheduling order of bounding boxes in the image_out_path.
@@ -314,6 +412,7 @@ def visualize_boxes(image_folder, ground_truth, cluster_box_info, Text_colors=(2
 
     Args:
         history: A dictionary of scheduling history read from json file. 
+        frame_store: a FrameStore to read the frames from instead of decoding them.
     """
     for image_name in cluster_box_info:
         cluster_boxes = cluster_box_info[image_name]
@@ -325,6 +424,8 @@ def visualize_boxes(image_folder, ground_truth, cluster_box_info, Text_colors=(2
         image_out_path = image_path[:i+1] + "out/" + image_path[i+1:]
         if os.path.exists(image_out_path):
             image = cv2.imread(image_out_path)
+        elif frame_store is not None:
+            image = frame_store.read_frame(image_path).copy()
         else:
             image = cv2.imread(image_path)
         image_h, image_w, _ = image.shape
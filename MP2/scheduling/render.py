@@ -0,0 +1,116 @@
+import os
+from multiprocessing import Pool
+import cv2
+
+
+def group_by_image(history):
+    """Group scheduling history entries by output image.
+
+    Args:
+        history: an iterable of (order, entry) pairs, where entry is a dictionary
+                with the fields of a TaskEntity, such as history.items() of the
+                json history.
+
+    Returns:
+        A list of (image_path, image_out_path, boxes) tuples, in order of first
+        appearance, where boxes is a list of (coord, missed, order) in history order.
+    """
+    images = {}
+    for order, entry in history:
+        out_path = entry["image_out_path"]
+        if out_path not in images:
+            images[out_path] = (entry["image_path"], out_path, [])
+        images[out_path][2].append((entry["coord"], entry["missed"], order))
+    return list(images.values())
+
+
+def draw_order_boxes(image, boxes, Text_colors=(255,255,255)):
+    """Draw the scheduling order of boxes on an image.
+
+    Blue for box that meet deadline and red for box that missed.
+
+    Args:
+        image: the decoded image, modified in place.
+        boxes: a list of (coord, missed, order).
+    """
+    image_h, image_w, _ = image.shape
+    bbox_thick = int(0.6 * (image_h + image_w) / 1000)
+    if bbox_thick < 1: bbox_thick = 1
+    fontScale = 0.75 * bbox_thick
+
+    for coor, missed, order in boxes:
+        bbox_color = (0,0,255) if (missed) else (255,0,0)
+        (x1, y1), (x2, y2) = (coor[0], coor[1]), (coor[2], coor[3])
+
+        # put object rectangle
+        cv2.rectangle(image, (x1, y1), (x2, y2), bbox_color, bbox_thick*2)
+        order_text = "order: " + str(order)
+        # get text size
+        (text_width, text_height), baseline = cv2.getTextSize(order_text, cv2.FONT_HERSHEY_COMPLEX_SMALL,
+                                                                fontScale, thickness=bbox_thick)
+        # put filled text rectangle
+        cv2.rectangle(image, (x1, y1), (x1 + text_width, y1 - text_height - baseline), bbox_color, thickness=cv2.FILLED)
+
+        # put text above rectangle
+        cv2.putText(image, order_text, (x1, y1-4), cv2.FONT_HERSHEY_COMPLEX_SMALL,
+                    fontScale, Text_colors, bbox_thick, lineType=cv2.LINE_AA)
+
+
+def render_image(job):
+    """Decode one image, draw all its boxes and write it once.
+
+    Args:
+        job: a tuple (image_path, image_out_path, boxes, Text_colors, png_compression,
+                frame_store), where frame_store is the directory of a FrameStore
+                holding the image, or None.
+    """
+    image_path, image_out_path, boxes, Text_colors, png_compression, frame_store = job
+    if os.path.exists(image_out_path):
+        image = cv2.imread(image_out_path)
+    elif frame_store is not None:
+        # imported here, FrameStore depends on misc which imports this module
+        from scheduling.FrameStore import open_frame_store
+        image = open_frame_store(frame_store).read_frame(image_path).copy()
+    else:
+        image = cv2.imread(image_path)
+
+    draw_order_boxes(image, boxes, Text_colors)
+
+    output_directory = os.path.dirname(image_out_path)
+    if output_directory and not os.path.exists(output_directory):
+        os.makedirs(output_directory, exist_ok=True)
+    cv2.imwrite(image_out_path, image, [cv2.IMWRITE_PNG_COMPRESSION, png_compression])
+    return image_out_path
+
+
+def render_history(history, Text_colors=(255,255,255), processes=None, png_compression=3,
+                   frame_store=None):
+    """Visualize a scheduling history, one decode and one write per image.
+
+    Entries are grouped by image, so each image is decoded once, all its boxes
+    are drawn and it is written once. Images are rendered in a process pool.
+
+    Args:
+        history: an iterable of (order, entry) pairs, see group_by_image().
+        Text_colors: color of the order labels.
+        processes: size of the process pool. Default is the number of CPUs;
+                1 renders in the calling process.
+        png_compression: PNG compression level from 0 (fastest) to 9 (smallest).
+                Default is 3, the same as cv2.imwrite.
+        frame_store: directory of a FrameStore to read the images from instead of
+                decoding them. Default is None.
+
+    Returns:
+        The number of images written.
+    """
+    jobs = [(image_path, image_out_path, boxes, Text_colors, png_compression, frame_store)
+            for image_path, image_out_path, boxes in group_by_image(history)]
+
+    if processes == 1 or len(jobs) <= 1:
+        for job in jobs:
+            render_image(job)
+    else:
+        with Pool(processes) as pool:
+            for _ in pool.imap_unordered(render_image, jobs):
+                pass
+    return len(jobs)
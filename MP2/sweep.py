@@ -0,0 +1,123 @@
+"""Sweep scheduler parameters across process_frame variants.
+
+Every combination of process_frame variant, frame period, number of frames and
+execution time model is simulated in a process pool, and the deadline miss rate,
+group response times, coverage and accuracy are collected into one table.
+
+Run from the MP2 directory, e.g.
+
+    python sweep.py --variants process_frame_p1 process_frame_p4 --frame-periods 30 100
+"""
+import argparse
+import itertools
+import json
+from multiprocessing import Pool
+from scheduling.Scheduler import *
+from scheduling.CostModel import LinearCostModel
+
+
+VARIANTS = ["process_frame_og", "process_frame_p1", "process_frame_p2",
+            "process_frame_p3", "process_frame_p4"]
+
+
+linear_exec_time = LinearCostModel()
+
+
+def slow_exec_time(task_batch):
+    """Twice the default execution time."""
+    return 2 * linear_exec_time(task_batch)
+
+
+def unbatched_exec_time(task_batch):
+    """Execution time without any benefit from batching."""
+    return task_batch.batch_size * linear_exec_time.estimate(task_batch.img_height, task_batch.img_width, 1)
+
+
+EXEC_TIME_MODELS = {
+    "linear": linear_exec_time,
+    "slow": slow_exec_time,
+    "unbatched": unbatched_exec_time,
+}
+
+ground_truth = None
+
+
+def load_ground_truth(path):
+    """Pool initializer: read the ground truth once per worker process."""
+    global ground_truth
+    ground_truth = load_box_info(path)
+
+
+def run_config(config):
+    """Simulate one configuration and return its row of the result table."""
+    scheduler = Scheduler(num_frames = config["num_frames"], frame_period = config["frame_period"],
+                          event_driven = True, process_frame = config["variant"],
+                          exec_time_model = EXEC_TIME_MODELS.get(config["exec_time_model"],
+                                                                 config["exec_time_model"]))
+    scheduler.run(save = False)
+
+    history = {}
+    for i, task in enumerate(scheduler.history):
+        history[i + 1] = task.__dict__
+    coverage, accuracy = compute_statistics(ground_truth, scheduler.scheduled_boxes)
+
+    row = dict(config)
+    row["tasks"] = scheduler.task_finish_count
+    row["miss_rate"] = scheduler.get_miss_rate()
+    row["group_avg_response_time"] = get_group_avg_response_time(history)
+    row["group_worst_response_time"] = get_group_worst_response_time(history)
+    row["coverage"] = coverage
+    row["accuracy"] = accuracy
+    return row
+
+
+def sweep(variants, frame_periods, num_frames, exec_time_models, processes = None,
+          ground_truth_path = '../dataset/waymo_ground_truth_flat.json'):
+    """Run every combination of the given parameters in a process pool.
+
+    Returns:
+        A list of result rows, in the order of the parameter grid.
+    """
+    configs = []
+    for variant, frame_period, frames, model in itertools.product(
+            variants, frame_periods, num_frames, exec_time_models):
+        configs.append({"variant": variant, "frame_period": frame_period,
+                        "num_frames": frames, "exec_time_model": model})
+
+    with Pool(processes, initializer=load_ground_truth, initargs=(ground_truth_path,)) as pool:
+        return pool.map(run_config, configs, chunksize=1)
+
+
+def print_table(rows):
+    """Print the result rows as a table."""
+    print('{:<18s}{:>8s}{:>8s}{:>11s}{:>8s}{:>11s}{:>10s}{:>10s}   {:s}'.format(
+        "variant", "period", "frames", "model", "tasks", "miss_rate", "coverage", "accuracy",
+        "worst response time per depth group"))
+    for row in rows:
+        print('{:<18s}{:>8d}{:>8d}{:>11s}{:>8d}{:>11.4f}{:>10.3f}{:>10.3f}   {:s}'.format(
+            row["variant"], row["frame_period"], row["num_frames"], row["exec_time_model"],
+            row["tasks"], row["miss_rate"], row["coverage"], row["accuracy"],
+            str(row["group_worst_response_time"])))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--variants", nargs="+", default=VARIANTS)
+    parser.add_argument("--frame-periods", nargs="+", type=int, default=[100])
+    parser.add_argument("--num-frames", nargs="+", type=int, default=[0],
+                        help="0 processes every frame in the dataset")
+    parser.add_argument("--exec-time-models", nargs="+", default=["linear"],
+                        help="names in {:s} or TableCostModel json files".format(
+                            ", ".join(sorted(EXEC_TIME_MODELS))))
+    parser.add_argument("--processes", type=int, default=None,
+                        help="size of the process pool, default is the number of CPUs")
+    parser.add_argument("--output", default=None, help="also save the table as json")
+    args = parser.parse_args()
+
+    rows = sweep(args.variants, args.frame_periods, args.num_frames, args.exec_time_models,
+                 args.processes)
+    print_table(rows)
+
+    if args.output:
+        with open(args.output, 'w') as outfile:
+            json.dump(rows, outfile, ensure_ascii=False, indent=4)
@@ -2,22 +2,21 @@ import time
 from scheduling.Scheduler import *
 
 
-scheduler = Scheduler()
-scheduler.run()
+# coverage and accuracy are evaluated while the scheduler runs
+ground_truth = load_box_info('../dataset/waymo_ground_truth_flat.json')
+scheduler = Scheduler(evaluator = ground_truth)
 
+# pass save = True to also write scheduling_history.json and scheduled_boxes.json
+result = scheduler.run()
+result.print_summary()
 
-cluster_box_info = read_json_file('scheduled_boxes.json')
-ground_truth = read_json_file('../dataset/waymo_ground_truth_flat.json')
-history = read_json_file("scheduling_history.json")
-
-# calculate group worst response time from history file
-group_worst_response_time = get_group_worst_response_time(history)
-group_avg_response_time = get_group_avg_response_time(history)
+# calculate group worst response time from the history
+group_worst_response_time = result.group_worst_response_time()
+group_avg_response_time = result.group_avg_response_time()
 print(group_worst_response_time)
 print(group_avg_response_time)
 
-get_statistics(ground_truth, cluster_box_info)
-
 # # visualize cluster boxes and ground truth boxes
+# cluster_box_info = {name: [box[:] for box in boxes] for name, boxes in result.scheduled_boxes.items()}
+# get_statistics(ground_truth, cluster_box_info)
 # visualize_boxes('../dataset/', ground_truth, cluster_box_info)
-
@@ -0,0 +1,64 @@
+import numpy as np
+from scheduling.misc import set_image_pixel_value, pixel_rectangles, union_area
+
+
+# a small frame keeps the raster reference fast
+HEIGHT = 40
+WIDTH = 60
+
+
+def raster_area(boxes):
+    """Count the pixels set_image_pixel_value() sets for the boxes."""
+    pixels = np.zeros((HEIGHT, WIDTH), dtype=np.uint8)
+    for box in boxes:
+        set_image_pixel_value(pixels, box, 1)
+    return int(np.count_nonzero(pixels))
+
+
+def rectangle_area(boxes):
+    """Count the same pixels with pixel_rectangles() and union_area()."""
+    rectangles = []
+    for box in boxes:
+        rectangles.extend(pixel_rectangles(box, HEIGHT, WIDTH))
+    return union_area(rectangles)
+
+
+def test_edge_boxes():
+    """Boxes touching x = 0 or y = 0, where set_image_pixel_value() wraps around."""
+    cases = [
+        [[0, 0, 10, 10]],
+        [[0, 5, 10, 15]],
+        [[5, 0, 15, 10]],
+        [[1, 1, 10, 10]],
+        [[0, 0, 1, 1]],
+        [[0, 0, WIDTH, HEIGHT]],
+        [[0, 0, WIDTH + 5, HEIGHT + 1]],
+        [[0, 0, 10, 10], [5, 5, 20, 20]],
+        [[0, 3, 12, 9], [2, 0, 8, 30], [50, 0, WIDTH, 1]],
+        [[10, 10, 10, 20], [10, 10, 20, 10]],
+    ]
+    for boxes in cases:
+        assert rectangle_area(boxes) == raster_area(boxes), boxes
+
+
+def test_random_boxes():
+    """Random boxes, many of them starting at x = 0 or y = 0."""
+    rng = np.random.default_rng(0)
+    for _ in range(500):
+        boxes = []
+        for _ in range(rng.integers(1, 6)):
+            x0, x1 = sorted(rng.integers(0, WIDTH + 5, 2))
+            # set_image_pixel_value() cannot index rows past HEIGHT
+            y0, y1 = sorted(rng.integers(0, HEIGHT + 2, 2))
+            if rng.random() < 0.25:
+                x0 = 0
+            if rng.random() < 0.25:
+                y0 = 0
+            boxes.append([int(x0), int(y0), int(x1), int(y1)])
+        assert rectangle_area(boxes) == raster_area(boxes), boxes
+
+
+if __name__ == "__main__":
+    test_edge_boxes()
+    test_random_boxes()
+    print("union_area matches set_image_pixel_value")